@@ -0,0 +1,270 @@
+# Замеры горячих путей на синтетических базах разного размера: загрузка
+# страниц таблицы операций (с сортировкой и фильтрами), загрузка целей,
+# построение графиков (данные и отрисовка на холсте Agg), отчет за месяц
+# и экспорт. Базы создаются benchmarks/generate_db.py и переиспользуются.
+# Каждый размер замеряется в отдельном процессе (Qt offscreen): время —
+# медиана повторов, первый (холодный) запуск отдельно, пик памяти Python
+# (tracemalloc) — в дополнительном запуске, пиковый RSS — на процесс.
+#
+# Результаты пишутся в JSON; --compare сравнивает их с прошлым запуском и
+# возвращает код 1 при замедлении больше допуска.
+#
+#   python benchmarks/bench_hotpaths.py --sizes 10k 100k 1M --output results.json
+#   python benchmarks/bench_hotpaths.py --sizes 10k 100k --compare results.json
+#   python benchmarks/bench_hotpaths.py --results new.json --compare old.json
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate_db
+
+DATA_DIR = os.path.join(tempfile.gettempdir(), "finance-bench-data")
+# Повторы медленного пути прекращаются, когда их суммарное время превышает бюджет
+REPEAT_BUDGET_SECONDS = 30
+# Различия меньше этих порогов считаются шумом при сравнении
+MIN_DELTA_SECONDS = 0.005
+MIN_DELTA_MB = 1.0
+
+
+def hot_paths(workdir):
+    # Имя пути -> функция без аргументов. Импорты внутри: модули загружаются
+    # в процессе замера после init_db
+    import services
+    import views
+    from models import transaction_date_range, transaction_filter
+    from PyQt6.QtCore import Qt
+
+    def first_page(model):
+        model.fetchMore()
+        return model
+
+    def transactions_scroll():
+        # Прокрутка на 20 страниц
+        model = views.TransactionTableModel()
+        for _ in range(20):
+            model.fetchMore()
+
+    def transactions_sorted():
+        model = views.TransactionTableModel()
+        model.sort(0, Qt.SortOrder.DescendingOrder)
+        first_page(model)
+
+    def transactions_filtered(**filters):
+        model = views.TransactionTableModel()
+        model.set_filter(transaction_filter(**filters))
+        first_page(model)
+
+    def chart(chart_type, **filters):
+        services.render_chart(chart_type, io.BytesIO(), **filters)
+
+    # Окна дат отсчитываются от последней операции, а не от сегодняшнего дня,
+    # чтобы на базе из кэша замерялись те же окна
+    today = transaction_date_range()[1] or date.today()
+    return {
+        "transactions.first_page": lambda: first_page(views.TransactionTableModel()),
+        "transactions.scroll_20_pages": transactions_scroll,
+        "transactions.sort_amount": transactions_sorted,
+        "transactions.filter_category_amount": lambda: transactions_filtered(
+            category="Продукты", amount_min=5000),
+        "transactions.filter_period_type": lambda: transactions_filtered(
+            date_from=today - timedelta(days=90), date_to=today, operation_type="Доход"),
+        "transactions.search_text": lambda: transactions_filtered(text="кофе"),
+        "goals.load": lambda: first_page(views.GoalTableModel()),
+        "chart.pie": lambda: chart(services.PIE_CHART),
+        "chart.bar": lambda: chart(services.BAR_CHART),
+        "chart.line": lambda: chart(services.LINE_CHART),
+        "chart.line_balance_days": lambda: chart(services.LINE_CHART, balance=True, bucket="day"),
+        "chart.line_window_90_days": lambda: chart(
+            services.LINE_CHART, date_from=today - timedelta(days=90), date_to=today),
+        "report.month": services.monthly_report,
+        "export.xlsx_last_year": lambda: services.export_file(
+            os.path.join(workdir, "export.xlsx"), date_from=today - timedelta(days=365)),
+        "export.csv": lambda: services.export_file(os.path.join(workdir, "export.csv")),
+        "export.parquet": lambda: services.export_file(os.path.join(workdir, "export.parquet")),
+    }
+
+
+def measure(function, repeat):
+    # (первый запуск, медиана, минимум, пик памяти Python в МБ)
+    times = []
+    while len(times) < repeat and (not times or sum(times) < REPEAT_BUDGET_SECONDS):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    # Первый запуск идет с холодным кэшем страниц SQLite и не входит в медиану
+    warm = times[1:] or times
+    return {
+        "first_seconds": round(times[0], 4),
+        "seconds": round(statistics.median(warm), 4),
+        "min_seconds": round(min(warm), 4),
+        "runs": len(times),
+        "peak_python_mb": round(peak / 2 ** 20, 2),
+    }
+
+
+def run_worker(database, repeat, only):
+    # Замеры в текущем процессе; результаты — JSON в stdout
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    from PyQt6.QtWidgets import QApplication
+    import models
+
+    app = QApplication(sys.argv)
+    models.init_db(database)
+    workdir = tempfile.mkdtemp(prefix="finance-bench-")
+    try:
+        paths = hot_paths(workdir)
+        results = {name: measure(function, repeat)
+                   for name, function in paths.items() if not only or any(part in name for part in only)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        models.db.close_all()
+    print(json.dumps({
+        "paths": results,
+        # ru_maxrss — в КБ в Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def prepare_database(rows, data_dir, years, seed):
+    path = generate_db.database_path(data_dir, rows, years, seed)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        started = time.perf_counter()
+        print(f"Создание базы на {rows} операций...", file=sys.stderr, flush=True)
+        generate_db.generate(path + ".tmp", rows, years, seed)
+        os.replace(path + ".tmp", path)
+        print(f"  готово за {time.perf_counter() - started:.1f} с", file=sys.stderr, flush=True)
+    return path
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_sizes(args):
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "generator_version": generate_db.GENERATOR_VERSION,
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    for rows in args.sizes:
+        database = prepare_database(rows, args.data_dir, args.years, args.seed)
+        print(f"Замер: {rows} операций", file=sys.stderr, flush=True)
+        command = [sys.executable, os.path.abspath(__file__), "--worker", database, "--repeat", str(args.repeat)]
+        for part in args.only or ():
+            command += ["--only", part]
+        output = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True).stdout
+        size = json.loads(output.strip().splitlines()[-1])
+        size["database_mb"] = round(os.path.getsize(database) / 2 ** 20, 1)
+        results["sizes"][str(rows)] = size
+    return results
+
+
+def print_results(results):
+    for rows, size in results["sizes"].items():
+        print(f"\n{rows} операций (база {size['database_mb']} МБ, пиковый RSS {size['max_rss_mb']} МБ)")
+        print(f"  {'путь':<38} {'медиана, с':>11} {'первый, с':>10} {'память, МБ':>11}")
+        for name, path in size["paths"].items():
+            print(f"  {name:<38} {path['seconds']:>11.4f} {path['first_seconds']:>10.4f} "
+                  f"{path['peak_python_mb']:>11.2f}")
+
+
+def compare(baseline, current, tolerance):
+    # Сравнивает медианы и пики памяти; возвращает список регрессий
+    if baseline.get("generator_version") != current.get("generator_version"):
+        print("Предупреждение: базы созданы разными версиями генератора", file=sys.stderr)
+    regressions = []
+    print(f"\nСравнение с {baseline.get('commit') or 'базовым запуском'} ({baseline.get('created')}), "
+          f"допуск {tolerance:.0%}")
+    for rows, size in current["sizes"].items():
+        old_size = baseline["sizes"].get(rows)
+        if old_size is None:
+            continue
+        print(f"\n{rows} операций")
+        for name, path in size["paths"].items():
+            old = old_size["paths"].get(name)
+            if old is None:
+                continue
+            ratio = path["seconds"] / old["seconds"] if old["seconds"] else 1.0
+            slower = (ratio > 1 + tolerance and path["seconds"] - old["seconds"] > MIN_DELTA_SECONDS)
+            bigger = (path["peak_python_mb"] > old["peak_python_mb"] * (1 + tolerance)
+                      and path["peak_python_mb"] - old["peak_python_mb"] > MIN_DELTA_MB)
+            mark = ""
+            if slower or bigger:
+                mark = "  <-- " + ", ".join(
+                    text for text, flag in (("время", slower), ("память", bigger)) if flag)
+                regressions.append((rows, name))
+            print(f"  {name:<38} {old['seconds']:>9.4f} -> {path['seconds']:>9.4f} с ({ratio:>5.2f}x)"
+                  f" {old['peak_python_mb']:>8.2f} -> {path['peak_python_mb']:>8.2f} МБ{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=generate_db.parse_size,
+                        default=[generate_db.parse_size(size) for size in ("10k", "100k")],
+                        help="размеры баз: 10k 100k 1M 10M")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", action="append", help="замерять только пути, содержащие подстроку")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="каталог сгенерированных баз")
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--results", help="не замерять, а взять результаты из JSON")
+    parser.add_argument("--compare", help="JSON прошлого запуска для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимое замедление (доля)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repeat, args.only)
+        return
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as source:
+            results = json.load(source)
+    else:
+        results = run_sizes(args)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as source:
+            regressions = compare(json.load(source), results, args.tolerance)
+        if regressions:
+            print(f"\nРегрессий: {len(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Сравнение массовой загрузки операций: построчно через модели peewee
+# (как раньше в views.py) и по столбцам — строки курсора идут сразу в массивы
+# NumPy, без экземпляров модели и словарей на каждую строку. Приложение
+# больше не загружает операции целиком (таблица читается страницами,
+# графики — из итоговых таблиц), поэтому загрузчик по столбцам живет здесь.
+#
+# Запуск: python benchmarks/bench_loader.py [число_строк ...]
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TRANSACTION_COLUMNS = ("id", "date", "category", "amount", "type")
+CHUNK_SIZE = 10000
+CATEGORIES = ["Еда", "Транспорт", "ЖКХ", "Развлечения", "Здоровье", "Одежда", "Зарплата"]
+
+
+def fill_database(models, rows):
+    # Заполняет пустую базу случайными операциями за последние три года
+    random.seed(rows)
+    start = date.today() - timedelta(days=3 * 365)
+    data = [
+        {
+            "amount": round(random.uniform(10, 10000), 2),
+            "category": random.choice(CATEGORIES),
+            "date": (start + timedelta(days=random.randrange(3 * 365))).isoformat(),
+            "type": random.choice(["Доход", "Расход"]),
+        }
+        for _ in range(rows)
+    ]
+    with models.db.atomic():
+        for start_row in range(0, rows, 5000):
+            models.Transaction.insert_many(data[start_row:start_row + 5000]).execute()
+
+
+def load_rows(models):
+    # Прежний способ: экземпляр модели и словарь на каждую строку
+    import pandas as pd
+
+    return pd.DataFrame([{
+        "Дата": datetime.strptime(str(t.date), "%Y-%m-%d"),
+        "Категория": t.category,
+        "Сумма": t.amount,
+        "Тип": t.type,
+    } for t in models.Transaction.select()])
+
+
+def load_transaction_columns(models):
+    # Словарь {столбец: numpy-массив}; даты разбираются векторно в datetime64[D]
+    import numpy as np
+
+    Transaction = models.Transaction
+    sql, params = (Transaction
+                   .select(*[getattr(Transaction, name) for name in TRANSACTION_COLUMNS])
+                   .order_by(Transaction.id)
+                   .sql())
+    cursor = models.db.execute_sql(sql, params)
+    columns = [[] for _ in TRANSACTION_COLUMNS]
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            break
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+
+    ids, dates, categories, amounts, types = columns
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "category": np.array(categories, dtype=object),
+        "amount": np.array(amounts, dtype=np.float64) / models.MoneyField.MINOR_UNITS,
+        "type": np.array(types, dtype=object),
+    }
+
+
+def load_columns(models):
+    # Операции в виде DataFrame; категория и тип хранятся как pandas.Categorical
+    import pandas as pd
+
+    df = pd.DataFrame(load_transaction_columns(models), columns=TRANSACTION_COLUMNS)
+    df["category"] = df["category"].astype("category")
+    df["type"] = df["type"].astype("category")
+    return df
+
+
+def measure(function, *args, repeat=3):
+    # Лучшее время из нескольких запусков
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes):
+    workdir = tempfile.mkdtemp(prefix="finance-bench-")
+    os.chdir(workdir)
+    import models
+
+    models.init_db()
+    loaded = 0
+    print(f"{'строк':>10} {'модели, с':>12} {'столбцы, с':>12} {'ускорение':>10}")
+    for size in sorted(sizes):
+        fill_database(models, size - loaded)
+        loaded = size
+        rows_time = measure(load_rows, models)
+        columns_time = measure(load_columns, models)
+        print(f"{size:>10} {rows_time:>12.3f} {columns_time:>12.3f} {rows_time / columns_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
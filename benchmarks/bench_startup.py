@@ -0,0 +1,92 @@
+# Время запуска: от старта процесса до первой отрисовки главного окна.
+# Каждый замер — отдельный холодный процесс (платформа Qt offscreen).
+# Возвращает код 1, если медиана превышает бюджет или до первой отрисовки
+# были импортированы тяжелые модули (matplotlib, pandas).
+#
+# Запуск: python benchmarks/bench_startup.py [--runs 5] [--budget 1.0] [--db finance.db]
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("matplotlib", "pandas")
+
+CHILD = r"""
+import json, sys, time
+sys.path.insert(0, {root!r})
+imported = time.time()
+from PyQt6.QtCore import QObject, QEvent
+from PyQt6.QtWidgets import QApplication
+import main
+from models import init_db
+imported = time.time() - imported
+
+class FirstPaint(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint:
+            print(json.dumps({{
+                "painted_at": time.time(),
+                "import_seconds": imported,
+                "heavy_modules": [name for name in {heavy!r} if name in sys.modules],
+            }}), flush=True)
+            app.quit()
+        return False
+
+app = QApplication(sys.argv)
+init_db()
+window = main.MainWindow()
+paint_filter = FirstPaint()
+window.installEventFilter(paint_filter)
+window.show()
+app.exec()
+"""
+
+
+def measure(workdir):
+    # Один холодный запуск; время отсчитывается от создания процесса
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    code = CHILD.format(root=ROOT, heavy=HEAVY_MODULES)
+    started = time.time()
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=workdir, env=env,
+        capture_output=True, text=True, timeout=120, check=True,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["first_paint_seconds"] = result.pop("painted_at") - started
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0, help="допустимая медиана, с")
+    parser.add_argument("--db", default=os.path.join(ROOT, "finance.db"), help="база для запуска (копируется)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="finance-startup-")
+    if os.path.exists(args.db):
+        shutil.copy(args.db, os.path.join(workdir, "finance.db"))
+    shutil.copy(os.path.join(ROOT, "money.ico"), workdir)
+
+    runs = [measure(workdir) for _ in range(args.runs)]
+    first_paint = statistics.median(run["first_paint_seconds"] for run in runs)
+    heavy = sorted({name for run in runs for name in run["heavy_modules"]})
+    report = {
+        "runs": args.runs,
+        "first_paint_median_seconds": round(first_paint, 3),
+        "import_median_seconds": round(statistics.median(run["import_seconds"] for run in runs), 3),
+        "budget_seconds": args.budget,
+        "heavy_modules_before_paint": heavy,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if first_paint > args.budget or heavy else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# Генератор синтетических баз finance.db для замеров производительности.
+# Распределения приближены к домашнему бюджету: частые мелкие расходы
+# (продукты, транспорт) и редкие крупные (техника, путешествия), суммы —
+# логнормальные по категориям, зарплата два раза в месяц, больше покупок
+# в выходные и в декабре, примечания у части операций. Несколько целей
+# привязаны к категориям операций.
+#
+# Запуск: python benchmarks/generate_db.py путь.db --rows 1M [--years 5] [--seed 0]
+# База на 1M операций создается несколько минут (вставка идет вместе с
+# полнотекстовым индексом), на 10M — около часа.
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Версия генератора: меняется при изменении распределений, чтобы не
+# сравнивать замеры на разных данных
+GENERATOR_VERSION = 1
+CHUNK_SIZE = 100000
+
+# Категория: (доля среди расходов, медиана суммы, разброс логнормального распределения)
+EXPENSES = {
+    "Продукты": (0.34, 1200, 0.6),
+    "Кафе": (0.12, 600, 0.5),
+    "Транспорт": (0.15, 300, 0.7),
+    "ЖКХ": (0.03, 6000, 0.3),
+    "Связь": (0.03, 700, 0.2),
+    "Здоровье": (0.05, 1500, 0.9),
+    "Одежда": (0.05, 3500, 0.8),
+    "Развлечения": (0.08, 1500, 0.8),
+    "Подарки": (0.04, 3000, 0.9),
+    "Дом": (0.08, 2000, 1.0),
+    "Электроника": (0.02, 20000, 1.0),
+    "Путешествия": (0.01, 40000, 0.8),
+}
+INCOMES = {
+    "Подработка": (0.5, 15000, 0.6),
+    "Кэшбэк": (0.4, 400, 0.8),
+    "Проценты": (0.1, 1200, 0.5),
+}
+SALARY = {"Зарплата": (1.0, 40000, 0.1)}
+SALARY_DAYS = (5, 20)
+INCOME_SHARE = 0.06
+NOTE_SHARE = 0.2
+NOTES = {
+    "Продукты": ["Пятерочка", "Перекресток", "рынок", "Магнит", "ВкусВилл"],
+    "Кафе": ["кофе", "обед", "пицца", "суши"],
+    "Транспорт": ["метро", "такси", "бензин", "парковка"],
+    "Здоровье": ["аптека", "стоматолог", "анализы"],
+    "Одежда": ["куртка", "обувь", "Wildberries"],
+    "Развлечения": ["кино", "концерт", "подписка"],
+    "Подарки": ["подарок маме", "день рождения", "Новый год"],
+    "Дом": ["Ozon", "посуда", "ремонт"],
+    "Электроника": ["ноутбук", "телефон", "наушники"],
+    "Путешествия": ["билеты", "отель", "экскурсия"],
+    "Подработка": ["фриланс", "консультация"],
+}
+GOALS = [
+    # (название, цель, категория, тип)
+    ("Отпуск", 300000, "Подработка", "Доход"),
+    ("Новый ноутбук", 150000, "Кэшбэк", "Доход"),
+    ("Лимит на кафе", 50000, "Кафе", "Расход"),
+    ("Подушка безопасности", 500000, "Проценты", "Доход"),
+    ("Машина", 1500000, None, None),
+    ("Ремонт", 400000, None, None),
+]
+
+
+def parse_size(text):
+    # 10k, 100k, 1M, 10M или число
+    multipliers = {"k": 1000, "m": 1000000}
+    suffix = text[-1].lower()
+    if suffix in multipliers:
+        return int(float(text[:-1]) * multipliers[suffix])
+    return int(text)
+
+
+def day_weights(days, first):
+    # Вес дня: выходные и декабрь — больше покупок
+    dates = np.datetime64(first, "D") + np.arange(days)
+    weekday = (dates.astype(np.int64) + 3) % 7
+    month = dates.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    weights = np.where(weekday >= 5, 1.4, 1.0) * np.where(month == 12, 1.3, 1.0)
+    return weights / weights.sum()
+
+
+def pick(rng, table, size):
+    names = list(table)
+    shares = np.array([table[name][0] for name in names])
+    index = rng.choice(len(names), size=size, p=shares / shares.sum())
+    medians = np.array([table[name][1] for name in names])[index]
+    sigmas = np.array([table[name][2] for name in names])[index]
+    amounts = np.round(rng.lognormal(np.log(medians), sigmas) * 100).astype(np.int64)
+    return [names[i] for i in index.tolist()], np.maximum(amounts, 100)
+
+
+def transaction_chunks(rows, years, seed):
+    # Пачки строк (сумма в копейках, категория, дата, тип, примечание) в порядке дат
+    rng = np.random.default_rng(seed)
+    last = date.today()
+    first = last - timedelta(days=round(365.25 * years) - 1)
+    days = (last - first).days + 1
+    day_names = [(first + timedelta(days=offset)).isoformat() for offset in range(days)]
+    # Зарплата приходит в дни SALARY_DAYS, остальные операции распределены по весам дней
+    salary_offsets = np.flatnonzero(np.isin([int(name[8:]) for name in day_names], SALARY_DAYS))
+    salary_offsets = salary_offsets[:rows].astype(np.int32)
+    per_day = rng.multinomial(rows - len(salary_offsets), day_weights(days, first))
+    day_offsets = np.concatenate([np.repeat(np.arange(days, dtype=np.int32), per_day), salary_offsets])
+    salary = np.zeros(rows, dtype=bool)
+    salary[rows - len(salary_offsets):] = True
+    order = np.argsort(day_offsets, kind="stable")
+    day_offsets, salary = day_offsets[order], salary[order]
+    for start in range(0, rows, CHUNK_SIZE):
+        offsets = day_offsets[start:start + CHUNK_SIZE]
+        is_salary = salary[start:start + CHUNK_SIZE]
+        size = len(offsets)
+        income = is_salary | (rng.random(size) < INCOME_SHARE)
+        categories = [None] * size
+        amounts = np.empty(size, dtype=np.int64)
+        for mask, table in ((is_salary, SALARY), (income & ~is_salary, INCOMES), (~income, EXPENSES)):
+            positions = np.flatnonzero(mask)
+            names, values = pick(rng, table, len(positions))
+            amounts[positions] = values
+            for position, name in zip(positions.tolist(), names):
+                categories[position] = name
+        with_note = (rng.random(size) < NOTE_SHARE).tolist()
+        note_choice = rng.integers(0, 1 << 30, size).tolist()
+        chunk = []
+        for offset, amount, category, is_income, noted, choice in zip(
+                offsets.tolist(), amounts.tolist(), categories, income.tolist(), with_note, note_choice):
+            notes = NOTES.get(category)
+            chunk.append((amount, category, day_names[offset], "Доход" if is_income else "Расход",
+                          notes[choice % len(notes)] if noted and notes else ""))
+        yield chunk
+
+
+def generate(path, rows, years=5, seed=0):
+    # Создает базу path (перезаписывая) и заполняет ее rows операциями.
+    # Итоги и накопления целей пересчитываются одним запросом после вставки,
+    # как при импорте
+    # Вместе с базой удаляются ее журнал WAL и индекс журнала
+    for stale in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    import models
+    from importer import INSERT_SQL
+
+    models.init_db(path)
+    db = models.db
+    today = date.today()
+    with db.atomic():
+        for title, target, category, operation_type in GOALS:
+            models.Goal.create(
+                title=title, target_amount=target, current_amount=0,
+                deadline=today + timedelta(days=730), category=category, type=operation_type,
+                start_date=today - timedelta(days=round(365.25 * years / 2)) if category else None,
+            )
+        models.suspend_rollup_triggers(True)
+        for chunk in transaction_chunks(rows, years, seed):
+            db.execute_many(INSERT_SQL, chunk)
+        models.add_rollups_since(0)
+        models.suspend_rollup_triggers(False)
+    db.execute_sql("PRAGMA optimize")
+    # db.close() только вернул бы соединение в пул; закрытие всех соединений
+    # переносит журнал WAL в файл базы, и его можно перемещать
+    db.close_all()
+
+
+def database_path(directory, rows, years=5, seed=0):
+    return os.path.join(directory, f"synthetic-v{GENERATOR_VERSION}-{rows}-{years}y-seed{seed}.db")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=parse_size, default=parse_size("100k"), help="10k, 100k, 1M, 10M или число")
+    parser.add_argument("--years", type=int, default=5, help="период операций до сегодняшнего дня")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args.path, args.rows, args.years, args.seed)
+    print(f"{args.path}: {args.rows} операций за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
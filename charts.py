@@ -0,0 +1,199 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from timeseries import aggregate, lttb, running_balance
+
+# Графики аналитики. Каждый график рисуется в собственные оси; при новых
+# данных той же структуры уже созданные художники (секторы, столбцы, линии)
+# обновляются на месте, а оси строятся заново только при смене состава данных.
+
+
+class Chart:
+    title = ""
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.key = None  # Ключ данных, по которым построен график
+        self.options = None  # Параметры отображения, не влияющие на данные
+
+    def draw(self, df):
+        if not self.update(df):
+            self.ax.clear()
+            self.create(df)
+            self.ax.set_title(self.title)
+
+    def create(self, df):
+        raise NotImplementedError
+
+    def update(self, df):
+        # Обновляет художники на месте; False, если график нужно построить заново
+        return False
+
+
+# Круговая диаграмма расходов по категориям
+class PieChart(Chart):
+    title = "Расходы по категориям"
+
+    def __init__(self, ax):
+        super().__init__(ax)
+        self.labels = None
+        self.wedges = self.texts = self.autotexts = ()
+
+    def create(self, df):
+        self.labels = list(df.index)
+        self.wedges, self.texts, self.autotexts = self.ax.pie(df["amount"], labels=df.index, autopct="%1.1f%%")
+
+    def update(self, df):
+        values = df["amount"].to_numpy(dtype=float)
+        total = values.sum()
+        if self.labels != list(df.index) or total <= 0:
+            return False
+        # Те же расчеты, что в Axes.pie: секторы против часовой стрелки от 0°,
+        # подписи на радиусе 1.1, проценты на радиусе 0.6
+        theta1 = 0.0
+        for wedge, text, autotext, value in zip(self.wedges, self.texts, self.autotexts, values):
+            theta2 = theta1 + 360.0 * value / total
+            wedge.set_theta1(theta1)
+            wedge.set_theta2(theta2)
+            angle = np.deg2rad((theta1 + theta2) / 2)
+            x, y = np.cos(angle), np.sin(angle)
+            text.set_position((1.1 * x, 1.1 * y))
+            text.set_horizontalalignment("left" if x > 0 else "right")
+            autotext.set_position((0.6 * x, 0.6 * y))
+            autotext.set_text(f"{100.0 * value / total:.1f}%")
+            theta1 = theta2
+        return True
+
+
+# Столбчатая диаграмма доходов/расходов по категориям (с накоплением)
+class BarChart(Chart):
+    title = "Доходы/расходы по категориям"
+
+    def __init__(self, ax):
+        super().__init__(ax)
+        self.shape = None
+
+    def create(self, df):
+        self.shape = (list(df.index), list(df["amount"].columns))
+        df["amount"].plot(kind="bar", ax=self.ax, stacked=True)
+
+    def update(self, df):
+        if self.shape != (list(df.index), list(df["amount"].columns)):
+            return False
+        bottom = np.zeros(len(df.index))
+        for container, column in zip(self.ax.containers, df["amount"].columns):
+            heights = df["amount"][column].to_numpy(dtype=float)
+            for bar, height, base in zip(container, heights, bottom):
+                bar.set_y(base)
+                bar.set_height(height)
+            bottom += heights
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return True
+
+
+# Линейный график доходов и расходов по интервалам дат. Данные приходят уже
+# для нужного интервала (день/неделя/месяц/квартал — df.attrs["bucket"]) и,
+# при увеличении, только для видимого окна дат (df.attrs["window"]). Суммы
+# складываются в интервалы, затем каждый ряд прореживается LTTB до бюджета
+# точек — примерно по точке на пиксель ширины
+class LineChart(Chart):
+    title = "Динамика доходов и расходов"
+    SERIES = ("Доход", "Расход")
+    BALANCE = "Баланс"
+    BUCKET_TITLES = {"day": "по дням", "week": "по неделям", "month": "по месяцам", "quarter": "по кварталам"}
+    # При автоматическом выборе на интервал приходится не меньше стольких пикселей
+    PIXELS_PER_BUCKET = 4
+
+    def __init__(self, ax):
+        super().__init__(ax)
+        self.lines = {}
+        self.bucket = None
+        self.drawing = False
+        # (показывать баланс, бюджет точек)
+        self.options = (False, 1000)
+        # Вызывается с новыми границами оси X (в единицах дат matplotlib)
+        # после масштабирования или сдвига графика пользователем
+        self.range_changed = None
+
+    def series(self, df):
+        # Ряды для отрисовки: имя -> (начала интервалов, значения)
+        balance, max_points = self.options
+        self.bucket = df.attrs.get("bucket", "day")
+        dates = df.index.to_numpy().astype("datetime64[D]")
+        names = [name for name in self.SERIES if name in df["amount"].columns]
+        columns = [df["amount"][name].to_numpy(dtype=float) if name in names else np.zeros(len(dates))
+                   for name in self.SERIES]
+        starts, sums = aggregate(dates, columns, self.bucket)
+        values = dict(zip(self.SERIES, sums))
+        series = {name: values[name] for name in names}
+        if balance:
+            series[self.BALANCE] = df.attrs.get("opening", 0) + running_balance(values["Доход"], values["Расход"])
+        return {name: lttb(starts, column, max_points) for name, column in series.items()}
+
+    def draw(self, df):
+        # Для окна дат границы оси X задает пользователь: они сохраняются
+        # при перестроении, а изменения во время отрисовки не сообщаются
+        windowed = df.attrs.get("window", False) and self.lines
+        xlim = self.ax.get_xlim()
+        self.drawing = True
+        try:
+            super().draw(df)
+            if windowed:
+                self.ax.set_xlim(xlim)
+            # plot() только помечает границы устаревшими, автомасштаб выполнился
+            # бы при отрисовке холста и был бы принят за действие пользователя.
+            # Чтение границ применяет его сейчас, пока изменения не сообщаются
+            self.ax.get_xlim()
+            self.ax.set_title(f"{self.title} ({self.BUCKET_TITLES[self.bucket]})")
+        finally:
+            self.drawing = False
+
+    def create(self, df):
+        self.lines = {}
+        for name, (x, y) in self.series(df).items():
+            self.lines[name], = self.ax.plot(x, y, label=name)
+        self.ax.legend()
+        # ax.clear() сбрасывает обработчики, поэтому подключаем заново
+        self.ax.callbacks.connect("xlim_changed", self.xlim_changed)
+
+    def update(self, df):
+        series = self.series(df)
+        if not self.lines or list(self.lines) != list(series):
+            return False
+        for name, line in self.lines.items():
+            line.set_data(*series[name])
+        self.ax.relim()
+        self.ax.autoscale_view(scalex=not df.attrs.get("window", False))
+        return True
+
+    def xlim_changed(self, ax):
+        if not self.drawing and self.range_changed is not None:
+            self.range_changed(*ax.get_xlim())
+
+
+CHARTS = {
+    "Круговая (категории)": PieChart,
+    "Столбчатая (доходы/расходы)": BarChart,
+    "Линейная (динамика)": LineChart,
+}
+
+
+# Кэш последних наборов данных графиков с вытеснением давно не использованных
+class LRUCache:
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+
+    def get(self, key):
+        if key not in self._items:
+            return None
+        self._items.move_to_end(key)
+        return self._items[key]
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
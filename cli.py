@@ -0,0 +1,179 @@
+# Командная строка для отчетов и пакетных задач без запуска интерфейса (например, из cron).
+#
+#   python -m cli report [--month 2025-04] [--json] [--db finance.db ...]
+#   python -m cli goals [--json] [--db ...]
+#   python -m cli export операции.xlsx [--from 2025-01-01] [--to 2025-03-31] [--type Расход] [--db ...]
+#   python -m cli import выписка.ofx [--db ...]
+#   python -m cli chart pie|bar|line график.png [--bucket month] [--balance] [--db ...]
+#   python -m cli recurring [--days 30] [--json] [--db ...]
+#   python -m cli budget [--from 2025-01] [--to 2025-06] [--json] [--db ...]
+#
+# Если указано несколько баз (--db повторяется), они обрабатываются параллельно
+# в отдельных процессах; к имени выходного файла добавляется имя базы.
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+import services
+from models import DATABASE_PATH
+
+CHART_TYPES = {
+    "pie": services.PIE_CHART,
+    "bar": services.BAR_CHART,
+    "line": services.LINE_CHART,
+}
+
+
+def output_path(path, database, databases):
+    # Для нескольких баз: отчет.xlsx -> отчет.finance.xlsx
+    if len(databases) == 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.path.splitext(os.path.basename(database))[0]}{extension}"
+
+
+def format_report(report):
+    lines = [f"Отчет за {report['month']}",
+             f"Доходы: {report['income_total']:.2f}",
+             f"Расходы: {report['expense_total']:.2f}",
+             f"Баланс: {report['balance']:.2f}",
+             f"Операций: {report['count']}"]
+    for title, key in (("Расходы по категориям", "expense"), ("Доходы по категориям", "income")):
+        if report[key]:
+            lines.append(f"\n{title}:")
+            lines.extend(f"  {category}: {total:.2f}" for category, total in report[key].items())
+    if report["goals"]:
+        lines.append("\nЦели:")
+        lines.extend(format_goal(goal) for goal in report["goals"])
+    return "\n".join(lines)
+
+
+def format_goal(goal):
+    text = f"  {goal['title']}: {goal['progress']:.2f} из {goal['target']:.2f} ({goal['percent']}%)"
+    if goal["projected"]:
+        text += f", прогноз {goal['projected']}"
+    return text
+
+
+def format_recurring(report):
+    lines = [f"Проведено регулярных операций: {report['posted']}"]
+    if report["upcoming"]:
+        lines.append("\nБлижайшие:")
+        lines.extend(f"  {item['date']} {item['title']}: {item['amount']:.2f} ({item['category']}, {item['type']})"
+                     for item in report["upcoming"])
+    return "\n".join(lines)
+
+
+def format_budgets(budgets):
+    lines = []
+    for budget in budgets:
+        text = f"  {budget['category']}: {budget['spent']:.2f} из {budget['budget']:.2f}"
+        if budget["percent"] is not None:
+            text += f" ({budget['percent']}%)"
+        if budget["remaining"] < 0:
+            text += f", перерасход {-budget['remaining']:.2f}"
+        lines.append(text)
+    return "\n".join(lines) or "Бюджетов нет"
+
+
+def run(jobs):
+    # jobs — {база: (функция, args, kwargs)}. Одна база обрабатывается в текущем
+    # процессе, несколько — параллельно в пуле процессов
+    if len(jobs) > 1:
+        return services.run_jobs(jobs)
+    (database, (function, args, kwargs)), = jobs.items()
+    try:
+        return {database: services.run_in_database(database, function, *args, **kwargs)}
+    except Exception as e:
+        return {database: e}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Домашние финансы без интерфейса")
+    parser.add_argument("--db", action="append", help="файл базы (можно указать несколько раз)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="итоги месяца по категориям и цели")
+    report.add_argument("--month", help="месяц YYYY-MM (по умолчанию текущий)")
+    report.add_argument("--json", action="store_true", help="вывод в JSON")
+
+    goals = commands.add_parser("goals", help="прогресс целей")
+    goals.add_argument("--json", action="store_true", help="вывод в JSON")
+
+    export = commands.add_parser("export", help="экспорт операций в XLSX, CSV или Parquet")
+    export.add_argument("path")
+    export.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    export.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    export.add_argument("--type", dest="operation_type", choices=["Доход", "Расход"])
+
+    import_parser = commands.add_parser("import", help="импорт операций из CSV, XLSX или OFX")
+    import_parser.add_argument("path")
+
+    chart = commands.add_parser("chart", help="график в файл (PNG, PDF, SVG)")
+    chart.add_argument("type", choices=list(CHART_TYPES))
+    chart.add_argument("path")
+    chart.add_argument("--bucket", default="auto", choices=["auto", "day", "week", "month", "quarter"])
+    chart.add_argument("--balance", action="store_true", help="баланс нарастающим итогом")
+
+    recurring_parser = commands.add_parser("recurring", help="провести наступившие регулярные операции")
+    recurring_parser.add_argument("--days", type=int, default=services.UPCOMING_DAYS,
+                                  help="показать повторения на столько дней вперед")
+    recurring_parser.add_argument("--json", action="store_true", help="вывод в JSON")
+
+    budget = commands.add_parser("budget", help="бюджеты против фактических расходов")
+    budget.add_argument("--from", dest="month_from", help="первый месяц YYYY-MM (по умолчанию текущий)")
+    budget.add_argument("--to", dest="month_to", help="последний месяц YYYY-MM")
+    budget.add_argument("--json", action="store_true", help="вывод в JSON")
+
+    args = parser.parse_args(argv)
+    databases = args.db or [DATABASE_PATH]
+
+    if args.command == "report":
+        job = lambda database: (services.monthly_report, (args.month,), {})
+    elif args.command == "goals":
+        job = lambda database: (services.goals_report, (), {})
+    elif args.command == "export":
+        job = lambda database: (services.export_file, (
+            output_path(args.path, database, databases), args.date_from, args.date_to, args.operation_type), {})
+    elif args.command == "import":
+        job = lambda database: (services.import_file, (args.path,), {})
+    elif args.command == "recurring":
+        job = lambda database: (services.recurring_report, (args.days,), {})
+    elif args.command == "budget":
+        job = lambda database: (services.budget_report, (args.month_from, args.month_to), {})
+    else:
+        filters = {"bucket": args.bucket} if args.type == "line" else {}
+        job = lambda database: (services.render_chart, (
+            CHART_TYPES[args.type], output_path(args.path, database, databases)), dict(balance=args.balance, **filters))
+    results = run({database: job(database) for database in databases})
+
+    failed = False
+    for database, result in results.items():
+        if len(results) > 1:
+            print(f"== {database}")
+        if isinstance(result, Exception):
+            failed = True
+            print(f"Ошибка: {result}", file=sys.stderr)
+        elif args.command in ("report", "goals", "recurring", "budget") and args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        elif args.command == "report":
+            print(format_report(result))
+        elif args.command == "goals":
+            print("\n".join(format_goal(goal) for goal in result) or "Целей нет")
+        elif args.command == "recurring":
+            print(format_recurring(result))
+        elif args.command == "budget":
+            print(format_budgets(result))
+        elif args.command == "export":
+            print(f"Экспортировано операций: {result}")
+        elif args.command == "import":
+            print(result.summary())
+        else:
+            print(f"График сохранен: {result}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
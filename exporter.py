@@ -0,0 +1,133 @@
+import csv
+import os
+import uuid
+
+from models import db, Transaction, MoneyField, read_snapshot
+
+# Потоковый экспорт операций. Строки читаются из SQLite курсором пачками
+# и сразу дописываются в файл, поэтому память не зависит от числа операций.
+# Фильтры по дате и типу выполняются в запросе и используют индексы.
+# Файл пишется под временным именем в той же папке и заменяет целевой только
+# после успешной записи: отмена или ошибка не оставляют обрезанный файл.
+
+CHUNK_SIZE = 5000
+HEADERS = ("Дата", "Категория", "Сумма", "Тип", "Примечание")
+
+
+def _filtered(query, date_from=None, date_to=None, operation_type=None):
+    if date_from is not None:
+        query = query.where(Transaction.date >= date_from)
+    if date_to is not None:
+        query = query.where(Transaction.date <= date_to)
+    if operation_type:
+        query = query.where(Transaction.type == operation_type)
+    return query
+
+
+def count_transactions(date_from=None, date_to=None, operation_type=None):
+    return _filtered(Transaction.select(), date_from, date_to, operation_type).count()
+
+
+def iter_transaction_chunks(date_from=None, date_to=None, operation_type=None, chunk_size=CHUNK_SIZE):
+    # Пачки строк (дата, категория, сумма в рублях, тип, примечание) в порядке дат
+    query = _filtered(
+        Transaction.select(Transaction.date, Transaction.category, Transaction.amount, Transaction.type,
+                           Transaction.notes),
+        date_from, date_to, operation_type,
+    ).order_by(Transaction.date, Transaction.id)
+    sql, params = query.sql()
+    cursor = db.execute_sql(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield [(row_date, category, amount / MoneyField.MINOR_UNITS, operation_type, notes)
+               for row_date, category, amount, operation_type, notes in rows]
+
+
+def write_csv(path, chunks):
+    with open(path, "w", encoding="utf-8-sig", newline="") as output:
+        writer = csv.writer(output, delimiter=";")
+        writer.writerow(HEADERS)
+        for chunk in chunks:
+            writer.writerows(chunk)
+
+
+def write_xlsx(path, chunks):
+    # Режим write_only: строки сразу сбрасываются в файл, а не копятся в книге
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Операции")
+    sheet.append(HEADERS)
+    for chunk in chunks:
+        for row in chunk:
+            sheet.append(row)
+    workbook.save(path)
+
+
+def write_parquet(path, chunks):
+    # Каждая пачка записывается отдельной группой строк
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Для экспорта в Parquet установите пакет pyarrow")
+
+    schema = pa.schema([
+        (HEADERS[0], pa.string()),
+        (HEADERS[1], pa.string()),
+        (HEADERS[2], pa.float64()),
+        (HEADERS[3], pa.string()),
+        (HEADERS[4], pa.string()),
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays([pa.array(column) for column in columns], schema=schema))
+
+
+WRITERS = {
+    ".csv": write_csv,
+    ".xlsx": write_xlsx,
+    ".parquet": write_parquet,
+}
+
+
+def export_transactions(path, date_from=None, date_to=None, operation_type=None,
+                        progress=None, check_cancelled=None, chunk_size=CHUNK_SIZE):
+    # Экспортирует операции в файл; формат определяется по расширению.
+    # Возвращает число записанных строк
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Неподдерживаемый формат файла: {extension or path}")
+
+    written = 0
+
+    def chunks():
+        nonlocal written
+        for chunk in iter_transaction_chunks(date_from, date_to, operation_type, chunk_size):
+            if check_cancelled is not None:
+                check_cancelled()
+            written += len(chunk)
+            yield chunk
+            if progress is not None:
+                progress(min(99, 100 * written / total))
+
+    directory, name = os.path.split(os.path.abspath(path))
+    temporary_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+    # Подсчет и выгрузка видят одно состояние базы; вставки во время
+    # экспорта не ждут его окончания
+    try:
+        with read_snapshot():
+            total = count_transactions(date_from, date_to, operation_type) or 1
+            WRITERS[extension](temporary_path, chunks())
+        os.replace(temporary_path, path)
+    except BaseException:
+        # В том числе TaskCancelled: недописанный файл удаляется
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+    if progress is not None:
+        progress(100)
+    return written
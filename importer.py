@@ -0,0 +1,317 @@
+import csv
+import io
+import os
+import re
+from collections import Counter
+from datetime import date, datetime
+
+from models import db, Transaction, notify, RESET, suspend_rollup_triggers, add_rollups_since
+
+# Импорт операций из CSV, XLSX и банковских выписок OFX.
+# Файл читается потоково, строки проверяются и записываются пачками
+# в одной транзакции: при ошибке или отмене база не меняется.
+
+CHUNK_SIZE = 20000
+# Сколько отклоненных строк сохраняется с причиной (остальные только считаются)
+MAX_ERRORS = 10
+# Размер блока при чтении выписки OFX, символов
+OFX_BLOCK_SIZE = 2 ** 20
+INCOME = 'Доход'
+EXPENSE = 'Расход'
+
+# Допустимые заголовки столбцов CSV/XLSX -> поле операции
+COLUMN_ALIASES = {
+    'дата': 'date', 'date': 'date',
+    'категория': 'category', 'category': 'category',
+    'сумма': 'amount', 'amount': 'amount',
+    'тип': 'type', 'type': 'type',
+    'примечание': 'notes', 'описание': 'notes', 'notes': 'notes', 'description': 'notes',
+}
+TYPE_ALIASES = {
+    'доход': INCOME, 'income': INCOME,
+    'расход': EXPENSE, 'expense': EXPENSE,
+}
+# Форматы дат кроме ISO и длина значимой части строки (в OFX после даты идет время)
+DATE_FORMATS = (('%d.%m.%Y', 10), ('%d/%m/%Y', 10), ('%Y%m%d', 8))
+
+
+# Итоги импорта
+class ImportReport:
+    def __init__(self):
+        self.read = 0        # Прочитано строк данных
+        self.inserted = 0    # Добавлено операций
+        self.duplicates = 0  # Пропущено: такая операция уже есть в базе
+        self.error_count = 0  # Отклонено строк
+        self.errors = []     # Первые MAX_ERRORS отклоненных строк: (номер строки, причина)
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        text = (f"Прочитано строк: {self.read}\n"
+                f"Добавлено операций: {self.inserted}\n"
+                f"Пропущено дубликатов: {self.duplicates}\n"
+                f"Строк с ошибками: {self.error_count}")
+        for line, message in self.errors:
+            text += f"\nСтрока {line}: {message}"
+        return text
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value or '').strip()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        pass
+    for date_format, length in DATE_FORMATS:
+        try:
+            return datetime.strptime(text[:length], date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"неверная дата: {text!r}")
+
+
+def parse_amount(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or '').strip().replace('\xa0', '').replace(' ', '').replace(',', '.')
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"сумма должна быть числом: {value!r}")
+
+
+def validate_row(raw):
+    # Приводит прочитанную строку к полям операции; тип без явного значения
+    # определяется по знаку суммы
+    amount = parse_amount(raw.get('amount'))
+    type_text = str(raw.get('type') or '').strip().lower()
+    if type_text:
+        if type_text not in TYPE_ALIASES:
+            raise ValueError(f"неизвестный тип операции: {raw.get('type')!r}")
+        operation_type = TYPE_ALIASES[type_text]
+    else:
+        operation_type = EXPENSE if amount < 0 else INCOME
+    category = str(raw.get('category') or '').strip()
+    if not category:
+        raise ValueError("не указана категория")
+    return {
+        'date': parse_date(raw.get('date')),
+        'category': category,
+        'amount': abs(amount),
+        'type': operation_type,
+        'notes': str(raw.get('notes') or '').strip(),
+    }
+
+
+def _map_header(header):
+    return [COLUMN_ALIASES.get(str(name or '').strip().lower()) for name in header]
+
+
+# Источники строк: генераторы пар (номер строки, словарь полей);
+# progress() возвращает долю прочитанного файла от 0 до 1
+
+class CsvSource:
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path) or 1
+        self.file = None
+
+    def rows(self):
+        with open(self.path, 'rb') as raw:
+            self.file = raw
+            text = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+            sample = text.readline()
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            header = _map_header(next(csv.reader([sample], dialect)))
+            for line, values in enumerate(csv.reader(text, dialect), start=2):
+                if any(values):
+                    yield line, {field: value for field, value in zip(header, values) if field}
+
+    def progress(self):
+        return self.file.tell() / self.size if self.file and not self.file.closed else 1
+
+
+class XlsxSource:
+    def __init__(self, path):
+        self.path = path
+        self.line = 0
+        self.total = 1
+
+    def rows(self):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            sheet = workbook.active
+            self.total = sheet.max_row or 1
+            values = sheet.iter_rows(values_only=True)
+            header = _map_header(next(values, ()))
+            for self.line, row in enumerate(values, start=2):
+                if any(cell is not None for cell in row):
+                    yield self.line, {field: value for field, value in zip(header, row) if field}
+        finally:
+            workbook.close()
+
+    def progress(self):
+        return self.line / self.total
+
+
+class OfxSource:
+    # Выписка OFX (SGML или XML): каждая операция — блок <STMTTRN>.
+    # Файл читается блоками; блок операции разбирается, когда прочитан его
+    # конец, незаконченный переносится в начало следующего блока
+    TRANSACTION = re.compile(r'<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))', re.S | re.I)
+    START = re.compile(r'<STMTTRN>', re.I)
+    TAG = re.compile(r'<(\w+)>([^<\r\n]*)')
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path) or 1
+        self.file = None
+
+    def rows(self):
+        with open(self.path, 'rb') as raw:
+            self.file = raw
+            text = io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+            buffer = ''
+            number = 0
+            while True:
+                block = text.read(OFX_BLOCK_SIZE)
+                buffer += block
+                end = 0
+                for match in self.TRANSACTION.finditer(buffer):
+                    end = match.end()
+                    number += 1
+                    tags = {tag.upper(): value.strip() for tag, value in self.TAG.findall(match.group(1))}
+                    yield number, {
+                        'date': tags.get('DTPOSTED', ''),
+                        'amount': tags.get('TRNAMT', ''),
+                        'category': tags.get('NAME') or tags.get('MEMO') or tags.get('TRNTYPE', ''),
+                        'notes': tags.get('MEMO', '') if tags.get('NAME') else '',
+                    }
+                if not block:
+                    break
+                # Остаток начинается с незаконченной операции; без нее хранится
+                # только хвост, в котором мог оборваться тег <STMTTRN>
+                start = self.START.search(buffer, end)
+                buffer = buffer[start.start():] if start else buffer[-len('<STMTTRN>'):]
+
+    def progress(self):
+        return self.file.tell() / self.size if self.file and not self.file.closed else 1
+
+
+SOURCES = {
+    '.csv': CsvSource,
+    '.xlsx': XlsxSource,
+    '.ofx': OfxSource,
+}
+
+
+def open_source(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SOURCES:
+        raise ValueError(f"Неподдерживаемый формат файла: {extension or path}")
+    return SOURCES[extension](path)
+
+
+INSERT_SQL = ('INSERT INTO "transaction" ("amount", "category", "date", "type", "notes") '
+              'VALUES (?, ?, ?, ?, ?)')
+
+
+def _dedup_key(row):
+    return (row['date'].isoformat(), row['category'], Transaction.amount.db_value(row['amount']))
+
+
+def _existing_keys(keys, last_id):
+    # Сколько раз каждый ключ (дата, категория, сумма в копейках) был в базе до
+    # импорта: строки с id больше last_id добавлены предыдущими пачками этого же
+    # файла и дубликатами не считаются. Ключи пачки кладутся во временную таблицу
+    # и соединяются с операциями по индексу (date, category, amount)
+    db.execute_sql(
+        'CREATE TEMP TABLE IF NOT EXISTS "import_keys" ('
+        '"date" DATE, "category" VARCHAR(255), "amount" INTEGER, '
+        'PRIMARY KEY ("date", "category", "amount")) WITHOUT ROWID'
+    )
+    db.execute_sql('DELETE FROM "import_keys"')
+    db.execute_many('INSERT OR IGNORE INTO "import_keys" VALUES (?, ?, ?)', keys)
+    cursor = db.execute_sql(
+        'SELECT t."date", t."category", t."amount", COUNT(*) FROM "import_keys" AS k '
+        'JOIN "transaction" AS t ON t."date" = k."date" AND t."category" = k."category" '
+        'AND t."amount" = k."amount" WHERE t."id" <= ? GROUP BY t."date", t."category", t."amount"',
+        (last_id,)
+    )
+    return Counter({(key_date, category, amount): count for key_date, category, amount, count in cursor})
+
+
+def _write_chunk(rows, report, last_id, matched):
+    # Записывает пачку, пропуская операции, которые были в базе до импорта.
+    # Совпадения считаются по количеству: две одинаковые покупки за день в файле
+    # при одной такой же в базе дают одну новую операцию, в каких бы пачках они
+    # ни оказались; matched — сколько строк базы по каждому ключу уже сопоставлено
+    # строкам предыдущих пачек.
+    # Вставка идет одним подготовленным INSERT через executemany: insert_many
+    # собирает SQL с параметрами каждой строки в Python, что в разы медленнее
+    keys = [_dedup_key(row) for row in rows]
+    existing = _existing_keys(keys, last_id)
+    fresh = []
+    for row, key in zip(rows, keys):
+        if existing[key] > matched[key]:
+            matched[key] += 1
+            report.duplicates += 1
+        else:
+            key_date, category, amount = key
+            fresh.append((amount, category, key_date, row['type'], row['notes']))
+    if fresh:
+        # Вставка в порядке дат обходит страницы индексов последовательно
+        fresh.sort(key=lambda values: (values[2], values[1]))
+        db.execute_many(INSERT_SQL, fresh)
+        report.inserted += len(fresh)
+
+
+def import_transactions(path, progress=None, check_cancelled=None, chunk_size=CHUNK_SIZE):
+    # Импортирует операции из файла; progress(percent) вызывается после каждой пачки,
+    # check_cancelled() может прервать импорт исключением (изменения откатываются)
+    source = open_source(path)
+    report = ImportReport()
+    chunk = []
+    matched = Counter()
+    # IMMEDIATE: блокировка записи берется сразу, до чтения last_id и поиска
+    # дубликатов, иначе другое соединение успело бы записать между чтением и вставкой
+    with db.atomic('IMMEDIATE'):
+        # Итоги по дням и месяцам обновляются один раз после вставки, а не триггером на каждую строку
+        last_id = db.execute_sql('SELECT COALESCE(MAX("id"), 0) FROM "transaction"').fetchone()[0]
+        suspend_rollup_triggers(True)
+        for line, raw in source.rows():
+            report.read += 1
+            try:
+                chunk.append(validate_row(raw))
+            except ValueError as e:
+                report.add_error(line, str(e))
+            if len(chunk) >= chunk_size:
+                _write_chunk(chunk, report, last_id, matched)
+                chunk = []
+                if check_cancelled is not None:
+                    check_cancelled()
+                if progress is not None:
+                    progress(min(99, 100 * source.progress()))
+        if chunk:
+            _write_chunk(chunk, report, last_id, matched)
+        add_rollups_since(last_id)
+        suspend_rollup_triggers(False)
+    if report.inserted:
+        # После крупной вставки обновляется статистика планировщика запросов
+        db.execute_sql('PRAGMA optimize')
+        notify(Transaction, RESET)
+    if progress is not None:
+        progress(100)
+    return report
@@ -1,9 +1,24 @@
+import os
 import sys
-from PyQt6.QtWidgets import QApplication, QMainWindow, QTabWidget
-from views import TransactionsTab, GoalsTab, AnalyticsTab
-from PyQt6.QtGui import QIcon
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget
+from PyQt6.QtGui import QIcon, QKeySequence, QShortcut
+from models import init_db, write_coalescer
+import profiling
+import services
+import views
 
 class MainWindow(QMainWindow):
+    # Вкладки: заголовок, атрибут окна и имя класса в views.
+    # Вкладка создается при первом переходе на нее
+    TABS = [
+        ("Операции", "transactions_tab", "TransactionsTab"),
+        ("Цели", "goals_tab", "GoalsTab"),
+        ("Аналитика", "analytics_tab", "AnalyticsTab"),
+        ("Регулярные", "recurring_tab", "RecurringTab"),
+        ("Бюджеты", "budgets_tab", "BudgetsTab"),
+    ]
+
     def __init__(self):
         super().__init__()
         
@@ -22,17 +37,45 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         self.tabs.setTabPosition(QTabWidget.TabPosition.North)
         
-        # Добавляем виджеты вкладок
-        self.transactions_tab = TransactionsTab()
-        self.goals_tab = GoalsTab()
-        self.analytics_tab = AnalyticsTab()
-        
-        self.tabs.addTab(self.transactions_tab, "Операции")
-        self.tabs.addTab(self.goals_tab, "Цели")
-        self.tabs.addTab(self.analytics_tab, "Аналитика")
+        # Пока вкладка не открыта, на ее месте пустой виджет
+        for title, attribute, _ in self.TABS:
+            setattr(self, attribute, None)
+            self.tabs.addTab(QWidget(), title)
+        self.tabs.currentChanged.connect(self.ensure_tab)
+        self.ensure_tab(self.tabs.currentIndex())
         
         self.setCentralWidget(self.tabs)
 
+        # Скрытая вкладка отладки: замеры запросов и интерфейса, профилирование
+        self.debug_tab = None
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self).activated.connect(self.toggle_debug_tab)
+
+    def ensure_tab(self, index):
+        # Создает вкладку при первом открытии
+        if not 0 <= index < len(self.TABS):
+            return
+        title, attribute, class_name = self.TABS[index]
+        if getattr(self, attribute) is not None:
+            return
+        tab = getattr(views, class_name)()
+        setattr(self, attribute, tab)
+        placeholder = self.tabs.widget(index)
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(index)
+        self.tabs.insertTab(index, tab, title)
+        self.tabs.setCurrentIndex(index)
+        self.tabs.blockSignals(False)
+        placeholder.deleteLater()
+
+    def toggle_debug_tab(self):
+        if self.debug_tab is None:
+            self.debug_tab = views.DebugTab()
+        index = self.tabs.indexOf(self.debug_tab)
+        if index < 0:
+            self.tabs.setCurrentIndex(self.tabs.addTab(self.debug_tab, "Отладка"))
+        else:
+            self.tabs.removeTab(index)
+
     def showEvent(self, event):
         # Запуск анимации при показе окна
         super().showEvent(event)
@@ -41,6 +84,21 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     
     app.setWindowIcon(QIcon("money.ico"))
+    # Подключение к базе и миграции — до создания окна
+    init_db()
+    # Наступившие регулярные операции проводятся до открытия окна
+    try:
+        services.post_recurring()
+    except Exception as e:
+        print(f"Ошибка при проведении регулярных операций: {e}")
+    # Записи интерфейса, сделанные подряд, фиксируются одной транзакцией
+    # через write_coalescer.delay после первой; при выходе — сразу
+    write_coalescer.schedule = lambda delay, flush: QTimer.singleShot(int(delay * 1000), flush)
+    app.aboutToQuit.connect(write_coalescer.flush)
     window = MainWindow()
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    code = app.exec()
+    # FINANCE_PROFILE=замеры.json — сохранить замеры при выходе
+    if os.environ.get("FINANCE_PROFILE"):
+        profiling.dump(os.environ["FINANCE_PROFILE"])
+    sys.exit(code)
\ No newline at end of file
@@ -1,28 +1,836 @@
 from peewee import *
+from playhouse.pool import PooledSqliteDatabase
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
 
-# Подключаемся к базе данных SQLite
-db = SqliteDatabase('finance.db')
+import profiling
+
+# База данных SQLite; подключение выполняет init_db() при запуске приложения.
+# Журнал WAL и synchronous=NORMAL: читатели не блокируют запись, а фиксация
+# транзакции не ждет fsync журнала. Кэш страниц 64 МБ ускоряет обновление
+# индексов при массовой вставке, mmap избавляет чтение от копирования
+# страниц, busy_timeout — ожидание блокировки записи другим процессом
+# (например, импортом) вместо ошибки "database is locked".
+# Прагмы можно переопределить переменной окружения FINANCE_DB_PRAGMAS
+# ("mmap_size=0;cache_size=-16000") или аргументом init_db
+DATABASE_PATH = 'finance.db'
+DATABASE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64000,
+    'mmap_size': 256 * 2 ** 20,
+    'busy_timeout': 10000,
+}
+# Пул соединений: у каждого потока свое соединение, после db.close() оно
+# возвращается в пул и достается следующей задаче с прогретым кэшем страниц.
+# Если все соединения заняты, поток ждет освобождения до timeout секунд
+DATABASE_POOL = {
+    'max_connections': 16,
+    'timeout': 60,
+}
+
+
+# Каждый запрос замеряется и записывается в profiling (см. вкладку отладки)
+class ProfiledSqliteDatabase(PooledSqliteDatabase):
+    def execute_sql(self, sql, params=None):
+        if not profiling.enabled:
+            return super().execute_sql(sql, params)
+        started = time.perf_counter()
+        cursor = super().execute_sql(sql, params)
+        return profiling.query_executed(cursor, sql, params, started)
+
+    def execute_many(self, sql, rows):
+        # Один подготовленный запрос для каждого набора параметров (executemany,
+        # массовая вставка); замеряется как один запрос с числом измененных строк
+        cursor = self.cursor()
+        if not profiling.enabled:
+            cursor.executemany(sql, rows)
+            return cursor
+        started = time.perf_counter()
+        cursor.executemany(sql, rows)
+        return profiling.query_executed(cursor, sql, None, started)
+
+# Соединения пула переходят между потоками, поэтому проверка потока sqlite3 отключена
+db = ProfiledSqliteDatabase(None, check_same_thread=False, **DATABASE_POOL)
+
+def database_pragmas(overrides=None):
+    # Прагмы подключения: DATABASE_PRAGMAS, затем FINANCE_DB_PRAGMAS, затем overrides
+    pragmas = dict(DATABASE_PRAGMAS)
+    for item in os.environ.get('FINANCE_DB_PRAGMAS', '').split(';'):
+        name, _, value = item.partition('=')
+        if name.strip():
+            value = value.strip()
+            pragmas[name.strip()] = int(value) if value.lstrip('-').isdigit() else value
+    pragmas.update(overrides or {})
+    return pragmas
+
+@contextmanager
+def read_snapshot():
+    # Запросы внутри блока видят одно состояние базы. В WAL такая транзакция
+    # чтения не блокирует запись: вставки из других потоков и процессов
+    # продолжаются, но в блок не попадают
+    with db.atomic('DEFERRED'):
+        yield
+
+# Группировка мелких записей из интерфейса. Первая запись открывает
+# транзакцию (BEGIN IMMEDIATE), следующие в пределах delay секунд выполняются
+# в ней же (каждая в своей точке сохранения: ошибка откатывает только ее),
+# а flush() фиксирует все одним COMMIT. Поток интерфейса видит свои записи
+# сразу, другие потоки и процессы — после фиксации. Отложенный flush ставит
+# в цикл событий функция schedule(delay, callback) (см. main.py); пока она не
+# задана, например в командной строке, каждая запись — своя транзакция
+class WriteCoalescer:
+    def __init__(self, database, delay=0.05, max_writes=200):
+        self.database = database
+        self.delay = delay
+        self.max_writes = max_writes
+        self.schedule = None
+        self._transaction = None
+        self._thread = None  # Поток, открывший транзакцию (у него свое соединение)
+        self._writes = 0
+
+    @contextmanager
+    def write(self):
+        # Без планировщика, из другого потока или внутри чужой транзакции —
+        # обычная транзакция на каждую запись
+        if (self.schedule is None or self._thread not in (None, threading.get_ident())
+                or (self._transaction is None and self.database.in_transaction())):
+            with self.database.atomic():
+                yield
+            return
+        if self._transaction is None:
+            transaction = self.database.atomic('IMMEDIATE')
+            transaction.__enter__()
+            self._transaction = transaction
+            self._thread = threading.get_ident()
+            self.schedule(self.delay, self.flush)
+        with self.database.atomic():
+            yield
+        self._writes += 1
+        if self._writes >= self.max_writes:
+            self.flush()
+
+    def pending(self):
+        return self._transaction is not None
+
+    def flush(self):
+        # Фиксирует накопленные записи; из другого потока не действует
+        if self._transaction is None or self._thread != threading.get_ident():
+            return
+        transaction = self._transaction
+        self._transaction = self._thread = None
+        self._writes = 0
+        transaction.__exit__(None, None, None)
+
+write_coalescer = WriteCoalescer(db)
+
+# Виды событий об изменении строк
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+RESET = 'reset'  # Массовое изменение: подписчик должен перечитать данные целиком
+
+# Подписчики на изменения: класс модели -> список callback(action, ids)
+_subscribers = {}
+# Версии данных: класс модели -> счетчик, растущий при каждом изменении строк
+_data_versions = {}
+
+def data_version(model_class):
+    # Текущая версия данных модели (ключ для кэшей производных данных)
+    return _data_versions.get(model_class, 0)
+
+def database_version():
+    # Счетчик изменений базы, зафиксированных другими соединениями (PRAGMA
+    # data_version соединения текущего потока): импорт из командной строки,
+    # процессы пула, рабочие потоки. Вместе с data_version — ключ для кэшей,
+    # учитывающий и записи в обход этого процесса
+    return db.execute_sql('PRAGMA data_version').fetchone()[0]
+
+def subscribe(model_class, callback):
+    # Подписывает callback на изменения строк модели
+    _subscribers.setdefault(model_class, []).append(callback)
+
+def unsubscribe(model_class, callback):
+    # Отписывает callback от изменений строк модели
+    callbacks = _subscribers.get(model_class, [])
+    if callback in callbacks:
+        callbacks.remove(callback)
+
+def notify(model_class, action, ids=None):
+    # Сообщает подписчикам об изменении строк с указанными id
+    _data_versions[model_class] = data_version(model_class) + 1
+    for callback in list(_subscribers.get(model_class, ())):
+        callback(action, list(ids) if ids is not None else None)
+
+# Базовая модель, сообщающая подписчикам о вставке, изменении и удалении строк
+class ObservableModel(Model):
+    def save(self, force_insert=False, only=None):
+        is_new = force_insert or self._pk is None
+        result = super().save(force_insert=force_insert, only=only)
+        if result:
+            notify(type(self), INSERT if is_new else UPDATE, [self._pk])
+        return result
+
+    def delete_instance(self, recursive=False, delete_nullable=False):
+        pk = self._pk
+        result = super().delete_instance(recursive=recursive, delete_nullable=delete_nullable)
+        if result:
+            notify(type(self), DELETE, [pk])
+        return result
+
+    @classmethod
+    def delete_by_id(cls, pk):
+        result = super().delete_by_id(pk)
+        if result:
+            notify(cls, DELETE, [pk])
+        return result
+
+    @classmethod
+    def delete_by_ids(cls, ids, batch_size=500):
+        # Удаляет строки пачками DELETE ... WHERE id IN (...) в одной транзакции
+        ids = list(ids)
+        pk = cls._meta.primary_key
+        deleted = 0
+        with cls._meta.database.atomic():
+            for start in range(0, len(ids), batch_size):
+                deleted += cls.delete().where(pk.in_(ids[start:start + batch_size])).execute()
+        if deleted:
+            notify(cls, DELETE, ids)
+        return deleted
+
+# Денежная сумма: в коде — рубли (float), в базе — целое число копеек
+class MoneyField(IntegerField):
+    MINOR_UNITS = 100
+
+    def db_value(self, value):
+        if value is None:
+            return None
+        return int(round(float(value) * self.MINOR_UNITS))
+
+    def python_value(self, value):
+        if value is None:
+            return None
+        return value / self.MINOR_UNITS
 
 # Модель для финансовых операций
-class Transaction(Model):
-    amount = FloatField()  # Сумма операции
-    category = CharField() # Категория (например, "Еда", "Транспорт")
-    date = CharField()     # Дата операции (в формате строки "YYYY-MM-DD")
+class Transaction(ObservableModel):
+    amount = MoneyField()  # Сумма операции (хранится в копейках)
+    category = CharField(index=True) # Категория (например, "Еда", "Транспорт")
+    date = DateField()     # Дата операции ("YYYY-MM-DD" в базе)
     type = CharField(choices=['Доход', 'Расход'])  # Тип: доход или расход
+    notes = TextField(default='')  # Примечание
 
     class Meta:
         database = db
+        indexes = (
+            (('type',), False),
+            (('amount',), False),
+            (('notes',), False),
+            (('date', 'category', 'amount'), False),
+        )
 
-# Модель для целей
-class Goal(Model):
+# Модель для целей. Цель может быть привязана к категории и типу операций:
+# тогда к начальной сумме добавляются суммы подходящих операций начиная
+# с start_date. Накопленное по операциям (tracked_amount) поддерживают
+# триггеры SQLite при каждом изменении операций, см. миграции
+class Goal(ObservableModel):
     title = CharField()          # Название цели
     target_amount = FloatField() # Целевая сумма
-    current_amount = FloatField(default=0)  # Текущая сумма
+    current_amount = FloatField(default=0)  # Начальная сумма (внесена вручную)
     deadline = CharField()       # Дедлайн (в формате строки "YYYY-MM-DD")
+    category = CharField(null=True, index=True)  # Категория операций, пополняющих цель
+    type = CharField(null=True)        # Тип этих операций: доход или расход
+    start_date = DateField(null=True)  # Операции учитываются с этой даты
+    tracked_amount = MoneyField(default=0)  # Сумма подходящих операций
+
+    class Meta:
+        database = db
+
+    def save(self, force_insert=False, only=None):
+        # tracked_amount пишут только триггеры: при изменении цели прочитанное
+        # ранее значение не должно затирать накопленное с тех пор
+        if only is None and not force_insert and self._pk is not None:
+            only = [field for field in self._meta.sorted_fields
+                    if field is not Goal.tracked_amount and not field.primary_key]
+        return super().save(force_insert=force_insert, only=only)
+
+# Регулярная операция (зарплата, аренда, подписка): расписание см. recurring.py.
+# Проведенные повторения создаются как обычные операции; next_index — номер
+# следующего непроведенного повторения, next_date — его дата (NULL, когда
+# расписание закончилось). По индексу next_date наступившие правила
+# находятся без разворачивания расписаний
+class RecurringRule(ObservableModel):
+    title = CharField()            # Название ("Аренда")
+    amount = MoneyField()          # Сумма операции
+    category = CharField()
+    type = CharField(choices=['Доход', 'Расход'])
+    notes = TextField(default='')
+    frequency = CharField(choices=['day', 'week', 'month', 'year'])
+    interval = IntegerField(default=1)  # Каждые interval дней/недель/месяцев/лет
+    start_date = DateField()       # Дата первого повторения
+    end_date = DateField(null=True)     # Последняя возможная дата (UNTIL)
+    count = IntegerField(null=True)     # Число повторений (COUNT)
+    next_index = IntegerField(default=0)
+    next_date = DateField(null=True, index=True)
+
+    class Meta:
+        database = db
+        table_name = 'recurring_rule'
+
+# Месячный бюджет расходов по категории начиная с месяца start_month
+class Budget(ObservableModel):
+    category = CharField(unique=True)
+    amount = MoneyField()          # Лимит расходов в месяц
+    start_month = CharField()      # Месяц "YYYY-MM", с которого действует бюджет
+
+    class Meta:
+        database = db
+
+# Итоги по дням и месяцам. Таблицы поддерживаются триггерами SQLite при каждой
+# вставке, изменении и удалении операции (в том числе массовых), см. миграции
+class DailyTotal(Model):
+    date = DateField()
+    type = CharField()
+    category = CharField()
+    total = MoneyField()           # Сумма операций за день
+    tx_count = IntegerField()      # Количество операций за день
 
     class Meta:
         database = db
+        table_name = 'daily_totals'
+        primary_key = CompositeKey('date', 'type', 'category')
+
+class MonthlyTotal(Model):
+    month = CharField()            # Месяц в формате "YYYY-MM"
+    type = CharField()
+    category = CharField()
+    total = MoneyField()
+    tx_count = IntegerField()
+
+    class Meta:
+        database = db
+        table_name = 'monthly_totals'
+        primary_key = CompositeKey('month', 'type', 'category')
+
+# Агрегаты для графиков читаются из итоговых таблиц: их размер зависит
+# от числа дней и категорий, а не от числа операций
+
+def money_sum(field):
+    # SUM по денежному полю в рублях (в базе суммы хранятся в копейках)
+    return fn.SUM(field) / float(MoneyField.MINOR_UNITS)
+
+def expenses_by_category():
+    # Сумма расходов по категориям: (категория, сумма)
+    return (MonthlyTotal
+            .select(MonthlyTotal.category, money_sum(MonthlyTotal.total))
+            .where(MonthlyTotal.type == 'Расход')
+            .group_by(MonthlyTotal.category)
+            .tuples())
+
+def totals_by_category_and_type():
+    # Суммы по категориям и типам: (категория, тип, сумма)
+    return (MonthlyTotal
+            .select(MonthlyTotal.category, MonthlyTotal.type, money_sum(MonthlyTotal.total))
+            .group_by(MonthlyTotal.category, MonthlyTotal.type)
+            .tuples())
+
+def totals_by_date_and_type(date_from=None, date_to=None):
+    # Суммы по датам и типам: (дата, тип, сумма), по возрастанию даты.
+    # Диапазон дат ограничивается по первичному ключу итогов (начинается с даты)
+    query = (DailyTotal
+             .select(DailyTotal.date, DailyTotal.type, money_sum(DailyTotal.total))
+             .group_by(DailyTotal.date, DailyTotal.type)
+             .order_by(DailyTotal.date))
+    if date_from is not None:
+        query = query.where(DailyTotal.date >= date_from)
+    if date_to is not None:
+        query = query.where(DailyTotal.date <= date_to)
+    return query.tuples()
+
+def totals_by_month_and_type(date_from=None, date_to=None):
+    # Суммы по месяцам и типам: (месяц "YYYY-MM", тип, сумма), по возрастанию месяца
+    query = (MonthlyTotal
+             .select(MonthlyTotal.month, MonthlyTotal.type, money_sum(MonthlyTotal.total))
+             .group_by(MonthlyTotal.month, MonthlyTotal.type)
+             .order_by(MonthlyTotal.month))
+    if date_from is not None:
+        query = query.where(MonthlyTotal.month >= date_from.strftime('%Y-%m'))
+    if date_to is not None:
+        query = query.where(MonthlyTotal.month <= date_to.strftime('%Y-%m'))
+    return query.tuples()
+
+def transaction_date_range():
+    # Первая и последняя дата операций (None, None — если операций нет)
+    first, last = DailyTotal.select(fn.MIN(DailyTotal.date), fn.MAX(DailyTotal.date)).tuples().get()
+    if first is None:
+        return None, None
+    return date.fromisoformat(str(first)), date.fromisoformat(str(last))
+
+def balance_before(day):
+    # Баланс (доходы минус расходы) по всем операциям до указанной даты
+    totals = dict(DailyTotal
+                  .select(DailyTotal.type, money_sum(DailyTotal.total))
+                  .where(DailyTotal.date < day)
+                  .group_by(DailyTotal.type)
+                  .tuples())
+    return (totals.get('Доход') or 0) - (totals.get('Расход') or 0)
+
+# Вычисляемые столбцы целей (для чтения всех целей одним запросом):
+# накоплено в рублях, процент выполнения и прогноз даты достижения цели
+# по темпу пополнения за последние GOAL_RATE_DAYS дней (из итогов по дням)
+GOAL_RATE_DAYS = 90
+
+# Накоплено в рублях: начальная сумма и операции (tracked_amount — в копейках)
+goal_progress = Goal.current_amount + Goal.tracked_amount.cast('REAL') / MoneyField.MINOR_UNITS
+goal_percent = fn.ROUND(100.0 * goal_progress / fn.NULLIF(Goal.target_amount, 0), 1)
+# Средняя сумма подходящих операций в день (в рублях) с начала окна темпа
+_goal_rate_start = fn.MAX(fn.date('now', 'localtime', f'-{GOAL_RATE_DAYS - 1} days'),
+                          fn.COALESCE(Goal.start_date, ''))
+goal_rate = fn.COALESCE(DailyTotal
+                        .select(fn.SUM(DailyTotal.total) / float(MoneyField.MINOR_UNITS)
+                                / (fn.julianday('now', 'localtime') - fn.julianday(_goal_rate_start) + 1))
+                        .where((DailyTotal.category == Goal.category)
+                               & (DailyTotal.type == Goal.type)
+                               & (DailyTotal.date >= _goal_rate_start)), 0)
+# Дата достижения цели при нынешнем темпе; NULL — цель достигнута или пополнений нет
+goal_projected_date = Case(None, [(
+    (goal_progress < Goal.target_amount) & (goal_rate > 0),
+    fn.date('now', 'localtime', fn.printf('+%d days',
+            ((Goal.target_amount - goal_progress) / goal_rate + 0.999).cast('INTEGER'))),
+)])
+
+def month_totals_by_category(month):
+    # Итоги месяца "YYYY-MM": (тип, категория, сумма, количество операций),
+    # внутри типа — по убыванию суммы
+    total = money_sum(MonthlyTotal.total)
+    return (MonthlyTotal
+            .select(MonthlyTotal.type, MonthlyTotal.category, total, fn.SUM(MonthlyTotal.tx_count))
+            .where(MonthlyTotal.month == month)
+            .group_by(MonthlyTotal.type, MonthlyTotal.category)
+            .order_by(MonthlyTotal.type, total.desc())
+            .tuples())
+
+# Бюджет против факта. Расходы читаются из месячных итогов — индекса расходов
+# по месяцам и категориям, который триггеры обновляют при каждом изменении
+# операций; индекс (type, category, month) отбирает строки одной категории
+# за период. Размер запроса зависит от числа бюджетов и месяцев, а не операций
+
+def budgets_with_spending(month_from, month_to):
+    # Бюджеты за месяцы [month_from, month_to] ("YYYY-MM"): (id, категория,
+    # лимит в месяц, первый учитываемый месяц, потрачено за период)
+    first_month = fn.MAX(Budget.start_month, month_from)
+    spent = fn.COALESCE(MonthlyTotal
+                        .select(fn.SUM(MonthlyTotal.total) / float(MoneyField.MINOR_UNITS))
+                        .where((MonthlyTotal.type == 'Расход')
+                               & (MonthlyTotal.category == Budget.category)
+                               & (MonthlyTotal.month >= first_month)
+                               & (MonthlyTotal.month <= month_to)), 0)
+    return (Budget
+            .select(Budget.id, Budget.category, Budget.amount, first_month, spent)
+            .order_by(Budget.category)
+            .tuples())
+
+def goals_with_progress():
+    # Цели с накопленным, процентом и прогнозом: (название, категория, целевая сумма,
+    # накоплено, процент, прогноз, дедлайн)
+    return (Goal
+            .select(Goal.title, Goal.category, Goal.target_amount, goal_progress, goal_percent,
+                    goal_projected_date, Goal.deadline)
+            .order_by(Goal.id)
+            .tuples())
+
+# Отбор операций для фильтров таблицы. Все условия собираются в одно выражение
+# WHERE: даты и тип обслуживаются индексами, текст ищется по индексу FTS5
+
+def search_query(text):
+    # Запрос FTS5 из введенного текста: каждое слово ищется как начало слова,
+    # должны совпасть все слова. Кавычки и операторы FTS5 из ввода отбрасываются
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', text))
+
+def transaction_filter(date_from=None, date_to=None, operation_type=None, category=None,
+                       amount_min=None, amount_max=None, text=None):
+    # Условие WHERE для операций (None — без ограничений); суммы в рублях
+    conditions = []
+    if date_from is not None:
+        conditions.append(Transaction.date >= date_from)
+    if date_to is not None:
+        conditions.append(Transaction.date <= date_to)
+    if operation_type:
+        conditions.append(Transaction.type == operation_type)
+    if category:
+        conditions.append(Transaction.category == category)
+    if amount_min is not None:
+        conditions.append(Transaction.amount >= amount_min)
+    if amount_max is not None:
+        conditions.append(Transaction.amount <= amount_max)
+    query = search_query(text or '')
+    if query:
+        conditions.append(Transaction.id.in_(SQL(
+            '(SELECT "rowid" FROM "transaction_search" WHERE "transaction_search" MATCH ?)', (query,))))
+    where = None
+    for condition in conditions:
+        where = condition if where is None else where & condition
+    return where
+
+def transaction_categories():
+    # Список категорий операций (из итоговой таблицы, без просмотра операций)
+    return [category for category, in (MonthlyTotal
+                                       .select(MonthlyTotal.category)
+                                       .distinct()
+                                       .order_by(MonthlyTotal.category)
+                                       .tuples())]
+
+# Миграции схемы. Каждая миграция применяется один раз, в отдельной транзакции;
+# номер последней примененной хранится в таблице schema_version.
+# Миграции описывают схему явным SQL, чтобы не зависеть от текущих моделей.
+MIGRATIONS = []
+
+def migration(function):
+    # Регистрирует миграцию; ее номер — порядковый номер в списке
+    MIGRATIONS.append(function)
+    return function
+
+@migration
+def create_initial_tables():
+    # Исходная схема (таблицы, созданные прежними версиями через create_tables)
+    db.execute_sql(
+        'CREATE TABLE IF NOT EXISTS "transaction" ('
+        '"id" INTEGER NOT NULL PRIMARY KEY, "amount" REAL NOT NULL, '
+        '"category" VARCHAR(255) NOT NULL, "date" VARCHAR(255) NOT NULL, '
+        '"type" VARCHAR(255) NOT NULL)'
+    )
+    db.execute_sql(
+        'CREATE TABLE IF NOT EXISTS "goal" ('
+        '"id" INTEGER NOT NULL PRIMARY KEY, "title" VARCHAR(255) NOT NULL, '
+        '"target_amount" REAL NOT NULL, "current_amount" REAL NOT NULL, '
+        '"deadline" VARCHAR(255) NOT NULL)'
+    )
+
+@migration
+def convert_transaction_amount_and_date():
+    # Суммы переводятся в целые копейки, дата получает тип DATE.
+    # SQLite не меняет тип столбца, поэтому таблица пересоздается.
+    db.execute_sql(
+        'CREATE TABLE "transaction_new" ('
+        '"id" INTEGER NOT NULL PRIMARY KEY, "amount" INTEGER NOT NULL, '
+        '"category" VARCHAR(255) NOT NULL, "date" DATE NOT NULL, '
+        '"type" VARCHAR(255) NOT NULL)'
+    )
+    db.execute_sql(
+        'INSERT INTO "transaction_new" ("id", "amount", "category", "date", "type") '
+        'SELECT "id", CAST(ROUND("amount" * 100) AS INTEGER), "category", "date", "type" '
+        'FROM "transaction"'
+    )
+    db.execute_sql('DROP TABLE "transaction"')
+    db.execute_sql('ALTER TABLE "transaction_new" RENAME TO "transaction"')
+
+@migration
+def add_transaction_indexes():
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "transaction_date" ON "transaction" ("date")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "transaction_type" ON "transaction" ("type")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "transaction_category" ON "transaction" ("category")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "transaction_type_date" ON "transaction" ("type", "date")')
+
+def _rollup_add_sql(row):
+    # Добавляет операцию row (NEW) к дневным и месячным итогам
+    return (
+        f'INSERT INTO "daily_totals" ("date", "type", "category", "total", "tx_count") '
+        f'VALUES ({row}."date", {row}."type", {row}."category", {row}."amount", 1) '
+        f'ON CONFLICT ("date", "type", "category") DO UPDATE SET '
+        f'"total" = "total" + excluded."total", "tx_count" = "tx_count" + 1; '
+        f'INSERT INTO "monthly_totals" ("month", "type", "category", "total", "tx_count") '
+        f'VALUES (substr({row}."date", 1, 7), {row}."type", {row}."category", {row}."amount", 1) '
+        f'ON CONFLICT ("month", "type", "category") DO UPDATE SET '
+        f'"total" = "total" + excluded."total", "tx_count" = "tx_count" + 1; '
+    )
+
+def _rollup_remove_sql(row):
+    # Вычитает операцию row (OLD) из итогов и удаляет опустевшие строки итогов
+    statements = []
+    for table, key, value in (('daily_totals', 'date', f'{row}."date"'),
+                              ('monthly_totals', 'month', f'substr({row}."date", 1, 7)')):
+        where = f'"{key}" = {value} AND "type" = {row}."type" AND "category" = {row}."category"'
+        statements.append(
+            f'UPDATE "{table}" SET "total" = "total" - {row}."amount", '
+            f'"tx_count" = "tx_count" - 1 WHERE {where}; '
+            f'DELETE FROM "{table}" WHERE {where} AND "tx_count" <= 0; '
+        )
+    return ''.join(statements)
+
+@migration
+def add_rollup_tables():
+    db.execute_sql(
+        'CREATE TABLE "daily_totals" ('
+        '"date" DATE NOT NULL, "type" VARCHAR(255) NOT NULL, "category" VARCHAR(255) NOT NULL, '
+        '"total" INTEGER NOT NULL, "tx_count" INTEGER NOT NULL, '
+        'PRIMARY KEY ("date", "type", "category"))'
+    )
+    db.execute_sql(
+        'CREATE TABLE "monthly_totals" ('
+        '"month" VARCHAR(7) NOT NULL, "type" VARCHAR(255) NOT NULL, "category" VARCHAR(255) NOT NULL, '
+        '"total" INTEGER NOT NULL, "tx_count" INTEGER NOT NULL, '
+        'PRIMARY KEY ("month", "type", "category"))'
+    )
+    _create_rollup_triggers()
+    rebuild_rollups()
+
+def _create_rollup_triggers(when=''):
+    db.execute_sql(
+        f'CREATE TRIGGER "transaction_rollup_insert" AFTER INSERT ON "transaction" {when}'
+        f'BEGIN {_rollup_add_sql("NEW")}END'
+    )
+    db.execute_sql(
+        f'CREATE TRIGGER "transaction_rollup_delete" AFTER DELETE ON "transaction" {when}'
+        f'BEGIN {_rollup_remove_sql("OLD")}END'
+    )
+    db.execute_sql(
+        'CREATE TRIGGER "transaction_rollup_update" '
+        f'AFTER UPDATE OF "amount", "date", "type", "category" ON "transaction" {when}'
+        f'BEGIN {_rollup_remove_sql("OLD")}{_rollup_add_sql("NEW")}END'
+    )
+
+def rebuild_rollups():
+    # Пересчитывает итоговые таблицы с нуля по таблице операций
+    with db.atomic():
+        db.execute_sql('DELETE FROM "daily_totals"')
+        db.execute_sql('DELETE FROM "monthly_totals"')
+        db.execute_sql(
+            'INSERT INTO "daily_totals" ("date", "type", "category", "total", "tx_count") '
+            'SELECT "date", "type", "category", SUM("amount"), COUNT(*) FROM "transaction" '
+            'GROUP BY "date", "type", "category"'
+        )
+        db.execute_sql(
+            'INSERT INTO "monthly_totals" ("month", "type", "category", "total", "tx_count") '
+            'SELECT substr("date", 1, 7), "type", "category", SUM("total"), SUM("tx_count") '
+            'FROM "daily_totals" GROUP BY substr("date", 1, 7), "type", "category"'
+        )
+
+def suspend_rollup_triggers(suspended):
+    # Включает или выключает построчное обновление итогов триггерами.
+    # Вызывается внутри транзакции массовой записи: другие соединения
+    # не видят флаг до фиксации, а к фиксации он снова сброшен
+    db.execute_sql('UPDATE "rollup_control" SET "suspended" = ?', (1 if suspended else 0,))
+
+def add_rollups_since(last_id):
+    # Добавляет к итогам операции с id больше last_id одним групповым запросом
+    # (после массовой вставки с выключенными триггерами)
+    for table, key in (('daily_totals', '"date"'), ('monthly_totals', 'substr("date", 1, 7)')):
+        key_column = 'date' if table == 'daily_totals' else 'month'
+        db.execute_sql(
+            f'INSERT INTO "{table}" ("{key_column}", "type", "category", "total", "tx_count") '
+            f'SELECT {key}, "type", "category", SUM("amount"), COUNT(*) FROM "transaction" '
+            f'WHERE "id" > ? GROUP BY {key}, "type", "category" '
+            f'ON CONFLICT ("{key_column}", "type", "category") DO UPDATE SET '
+            f'"total" = "total" + excluded."total", "tx_count" = "tx_count" + excluded."tx_count"',
+            (last_id,),
+        )
+    db.execute_sql(
+        f'UPDATE "goal" SET "tracked_amount" = "tracked_amount" + ({_GOAL_TRACKED_SQL} AND "t"."id" > ?) '
+        'WHERE "category" IS NOT NULL',
+        (last_id,),
+    )
+
+# Накопленное по операциям для целей: те же правила, что и в триггерах
+_GOAL_MATCH = ('"t"."category" = "goal"."category" AND "t"."type" = "goal"."type" '
+               'AND ("goal"."start_date" IS NULL OR "t"."date" >= "goal"."start_date")')
+_GOAL_TRACKED_SQL = f'SELECT COALESCE(SUM("t"."amount"), 0) FROM "transaction" AS "t" WHERE {_GOAL_MATCH}'
+
+def _goal_progress_sql(row, sign):
+    # Изменяет накопленное целей, к которым относится операция row (NEW/OLD)
+    return (f'UPDATE "goal" SET "tracked_amount" = "tracked_amount" {sign} {row}."amount" '
+            f'WHERE "category" = {row}."category" AND "type" = {row}."type" '
+            f'AND ("start_date" IS NULL OR "start_date" <= {row}."date");')
+
+def rebuild_goal_progress():
+    # Пересчитывает накопленное по операциям для всех целей
+    db.execute_sql(f'UPDATE "goal" SET "tracked_amount" = ({_GOAL_TRACKED_SQL})')
+
+def check_rollups():
+    # Сверяет итоговые таблицы с операциями; возвращает расходящиеся строки
+    # в виде (таблица, ключ, сумма, количество), для согласованных итогов — пустой список
+    expected = {
+        'daily_totals': (
+            'SELECT "date", "type", "category", SUM("amount"), COUNT(*) FROM "transaction" '
+            'GROUP BY "date", "type", "category"'
+        ),
+        'monthly_totals': (
+            'SELECT substr("date", 1, 7), "type", "category", SUM("amount"), COUNT(*) '
+            'FROM "transaction" GROUP BY substr("date", 1, 7), "type", "category"'
+        ),
+    }
+    mismatches = []
+    for table, query in expected.items():
+        stored = f'SELECT * FROM "{table}"'
+        for sql in (f'{query} EXCEPT {stored}', f'{stored} EXCEPT {query}'):
+            for key_date, key_type, key_category, total, count in db.execute_sql(sql).fetchall():
+                mismatches.append((table, (key_date, key_type, key_category), total, count))
+    goals = db.execute_sql(
+        f'SELECT "id", "tracked_amount", ({_GOAL_TRACKED_SQL}) AS "expected" FROM "goal" '
+        'WHERE "tracked_amount" != "expected"'
+    )
+    for goal_id, tracked, expected in goals.fetchall():
+        mismatches.append(('goal', (goal_id,), tracked, expected))
+    return mismatches
+
+@migration
+def add_transaction_dedup_index():
+    # Покрывающий индекс для поиска дубликатов при импорте. Он же обслуживает
+    # фильтры по дате, а (type, date) — по типу, поэтому отдельные индексы
+    # date и type только замедляют запись
+    db.execute_sql(
+        'CREATE INDEX IF NOT EXISTS "transaction_date_category_amount" '
+        'ON "transaction" ("date", "category", "amount")'
+    )
+    db.execute_sql('DROP INDEX IF EXISTS "transaction_date"')
+    db.execute_sql('DROP INDEX IF EXISTS "transaction_type"')
+
+@migration
+def add_rollup_trigger_switch():
+    # Триггеры итогов срабатывают, только пока флаг suspended сброшен
+    db.execute_sql('CREATE TABLE "rollup_control" ("suspended" INTEGER NOT NULL)')
+    db.execute_sql('INSERT INTO "rollup_control" ("suspended") VALUES (0)')
+    for name in ('insert', 'delete', 'update'):
+        db.execute_sql(f'DROP TRIGGER "transaction_rollup_{name}"')
+    _create_rollup_triggers('WHEN (SELECT "suspended" FROM "rollup_control") = 0 ')
+
+@migration
+def add_transaction_notes_and_search():
+    # Примечание к операции и полнотекстовый индекс FTS5 по категории и примечанию.
+    # Таблица поиска хранит только индекс (content='transaction'), текст берется
+    # из операций; триггеры обновляют индекс при любом изменении операций
+    db.execute_sql('ALTER TABLE "transaction" ADD COLUMN "notes" TEXT NOT NULL DEFAULT \'\'')
+    db.execute_sql(
+        'CREATE VIRTUAL TABLE "transaction_search" USING fts5('
+        '"category", "notes", content=\'transaction\', content_rowid=\'id\', '
+        'tokenize=\'unicode61 remove_diacritics 2\', prefix=\'2 3\')'
+    )
+    insert = ('INSERT INTO "transaction_search" ("rowid", "category", "notes") '
+              'VALUES (NEW."id", NEW."category", NEW."notes");')
+    delete = ('INSERT INTO "transaction_search" ("transaction_search", "rowid", "category", "notes") '
+              'VALUES (\'delete\', OLD."id", OLD."category", OLD."notes");')
+    db.execute_sql(f'CREATE TRIGGER "transaction_search_insert" AFTER INSERT ON "transaction" BEGIN {insert} END')
+    db.execute_sql(f'CREATE TRIGGER "transaction_search_delete" AFTER DELETE ON "transaction" BEGIN {delete} END')
+    db.execute_sql(
+        'CREATE TRIGGER "transaction_search_update" AFTER UPDATE OF "category", "notes" ON "transaction" '
+        f'BEGIN {delete} {insert} END'
+    )
+    db.execute_sql('INSERT INTO "transaction_search" ("transaction_search") VALUES (\'rebuild\')')
+    # Индексы для сортировки таблицы операций: страницы читаются в порядке
+    # (столбец, id), а индекс по одному столбцу хранит строки именно так.
+    # Дата и категория уже покрыты индексами (date, ...) и (category).
+    # Индекс (type, date) заменяется на (type): отбор по типу и периоду
+    # обслуживает индекс по дате, а лишний индекс замедляет импорт
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "transaction_amount" ON "transaction" ("amount")')
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "transaction_type" ON "transaction" ("type")')
+    db.execute_sql('DROP INDEX IF EXISTS "transaction_type_date"')
+    # Статистика для выбора индекса при сочетании нескольких фильтров
+    db.execute_sql('ANALYZE')
+
+@migration
+def add_goal_tracking():
+    # Привязка целей к категории и типу операций. Накопленное по операциям
+    # обновляется триггерами на операциях (при массовой вставке они выключаются
+    # вместе с триггерами итогов, см. add_rollups_since) и пересчитывается
+    # триггерами на целях при создании цели или смене привязки
+    for column in ('"category" VARCHAR(255)', '"type" VARCHAR(255)', '"start_date" DATE',
+                   '"tracked_amount" INTEGER NOT NULL DEFAULT 0'):
+        db.execute_sql(f'ALTER TABLE "goal" ADD COLUMN {column}')
+    db.execute_sql('CREATE INDEX "goal_category" ON "goal" ("category")')
+    when = 'WHEN (SELECT "suspended" FROM "rollup_control") = 0 '
+    db.execute_sql(
+        f'CREATE TRIGGER "transaction_goal_insert" AFTER INSERT ON "transaction" {when}'
+        f'BEGIN {_goal_progress_sql("NEW", "+")} END'
+    )
+    db.execute_sql(
+        f'CREATE TRIGGER "transaction_goal_delete" AFTER DELETE ON "transaction" {when}'
+        f'BEGIN {_goal_progress_sql("OLD", "-")} END'
+    )
+    db.execute_sql(
+        'CREATE TRIGGER "transaction_goal_update" '
+        f'AFTER UPDATE OF "amount", "date", "type", "category" ON "transaction" {when}'
+        f'BEGIN {_goal_progress_sql("OLD", "-")} {_goal_progress_sql("NEW", "+")} END'
+    )
+    recompute = f'UPDATE "goal" SET "tracked_amount" = ({_GOAL_TRACKED_SQL}) WHERE "id" = NEW."id";'
+    db.execute_sql(f'CREATE TRIGGER "goal_tracking_insert" AFTER INSERT ON "goal" BEGIN {recompute} END')
+    db.execute_sql(
+        'CREATE TRIGGER "goal_tracking_update" AFTER UPDATE OF "category", "type", "start_date" ON "goal" '
+        f'BEGIN {recompute} END'
+    )
+
+@migration
+def add_recurring_rules_and_budgets():
+    db.execute_sql(
+        'CREATE TABLE "recurring_rule" ('
+        '"id" INTEGER NOT NULL PRIMARY KEY, "title" VARCHAR(255) NOT NULL, '
+        '"amount" INTEGER NOT NULL, "category" VARCHAR(255) NOT NULL, "type" VARCHAR(255) NOT NULL, '
+        '"notes" TEXT NOT NULL DEFAULT \'\', "frequency" VARCHAR(255) NOT NULL, '
+        '"interval" INTEGER NOT NULL DEFAULT 1, "start_date" DATE NOT NULL, "end_date" DATE, '
+        '"count" INTEGER, "next_index" INTEGER NOT NULL DEFAULT 0, "next_date" DATE)'
+    )
+    db.execute_sql('CREATE INDEX "recurring_rule_next_date" ON "recurring_rule" ("next_date")')
+    db.execute_sql(
+        'CREATE TABLE "budget" ('
+        '"id" INTEGER NOT NULL PRIMARY KEY, "category" VARCHAR(255) NOT NULL, '
+        '"amount" INTEGER NOT NULL, "start_month" VARCHAR(255) NOT NULL)'
+    )
+    db.execute_sql('CREATE UNIQUE INDEX "budget_category" ON "budget" ("category")')
+    # Расходы категории за период — диапазон этого индекса (и сумма из него же)
+    db.execute_sql(
+        'CREATE INDEX "monthly_totals_type_category" '
+        'ON "monthly_totals" ("type", "category", "month", "total")'
+    )
+
+@migration
+def add_transaction_notes_index():
+    # Сортировка таблицы операций по примечанию: страницы читаются в порядке
+    # (notes, id) по индексу, а не полным просмотром с сортировкой
+    db.execute_sql('CREATE INDEX IF NOT EXISTS "transaction_notes" ON "transaction" ("notes")')
+
+def schema_version():
+    # Номер последней примененной миграции (0 для новой базы)
+    db.execute_sql('CREATE TABLE IF NOT EXISTS "schema_version" ("version" INTEGER NOT NULL)')
+    return db.execute_sql('SELECT MAX("version") FROM "schema_version"').fetchone()[0] or 0
+
+def migrate():
+    # Применяет к базе все еще не примененные миграции
+    current = schema_version()
+    for version, function in enumerate(MIGRATIONS, start=1):
+        if version <= current:
+            continue
+        with db.atomic():
+            function()
+            db.execute_sql('INSERT INTO "schema_version" ("version") VALUES (?)', (version,))
+
+def init_db(path=DATABASE_PATH, pragmas=None):
+    # Подключается к базе данных и обновляет ее схему до текущей версии.
+    # Соединения пула с прежней базой закрываются
+    if not db.deferred:
+        db.close_all()
+    db.init(path, pragmas=database_pragmas(pragmas))
+    db.connect(reuse_if_open=True)
+    migrate()
+
+if __name__ == '__main__':
+    # Обслуживание итоговых таблиц: python models.py rebuild-rollups | check-rollups
+    import sys
 
-# Создаем таблицы в базе данных (если они еще не созданы)
-db.connect()
-db.create_tables([Transaction, Goal], safe=True)
\ No newline at end of file
+    init_db()
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'rebuild-rollups':
+        rebuild_rollups()
+        with db.atomic():
+            rebuild_goal_progress()
+        print('Итоговые таблицы и накопления целей пересчитаны')
+    elif command == 'check-rollups':
+        mismatches = check_rollups()
+        for mismatch in mismatches:
+            print(*mismatch)
+        print('Расхождений нет' if not mismatches else f'Расхождений: {len(mismatches)}')
+        sys.exit(1 if mismatches else 0)
+    else:
+        print('Использование: python models.py rebuild-rollups | check-rollups')
+        sys.exit(2)
@@ -0,0 +1,296 @@
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+# Инструментирование: время запросов к базе (SQL, длительность, число строк)
+# и путей интерфейса (загрузка таблиц, построение графиков, фоновые задачи).
+# Для каждого запроса и пути хранится скользящая гистограмма задержек по
+# последним замерам. Данные показывает скрытая вкладка отладки (Ctrl+Shift+D),
+# их можно сохранить в JSON. Дополнительно — профилирование cProfile по
+# запросу: поток интерфейса и фоновые задачи (см. tasks.py).
+#
+# Запись включена по умолчанию (выключается флагом enabled): на запрос —
+# замер времени и запись под блокировкой, на строку — вызов через обертку
+# курсора, около 0,4 мс на страницу таблицы из 500 строк.
+
+enabled = True
+
+# Границы корзин гистограммы, мс (последняя корзина — все, что больше)
+HISTOGRAM_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# Сколько последних замеров хранит каждая гистограмма
+WINDOW = 1000
+# Сколько различных текстов запросов хранится (давно не выполнявшиеся вытесняются)
+MAX_QUERIES = 500
+# Сколько последних запросов хранится целиком
+RECENT_QUERIES = 200
+SQL_PREVIEW = 2000
+
+# Повторно входимая: __del__ курсора может сработать при сборке мусора,
+# пока блокировка уже захвачена этим же потоком
+_lock = threading.RLock()
+
+
+# Скользящая гистограмма задержек: последние WINDOW замеров и накопленные итоги
+class LatencyHistogram:
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)  # Длительности, с
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+
+    def add(self, seconds, rows=0):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+        self.rows += rows
+
+    def summary(self):
+        # Итоги за все время и перцентили по окну последних замеров, мс
+        samples = sorted(self.samples)
+        if not samples:
+            return None
+
+        def percentile(share):
+            return round(samples[min(len(samples) - 1, int(share * len(samples)))] * 1000, 3)
+
+        buckets = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+        position = 0
+        for seconds in samples:
+            milliseconds = seconds * 1000
+            while position < len(HISTOGRAM_EDGES_MS) and milliseconds >= HISTOGRAM_EDGES_MS[position]:
+                position += 1
+            buckets[position] += 1
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3),
+            "rows": self.rows,
+            "window": len(samples),
+            "p50_ms": percentile(0.5),
+            "p90_ms": percentile(0.9),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 3),
+            "histogram": buckets,
+        }
+
+
+_paths = {}               # Путь интерфейса -> LatencyHistogram
+_queries = OrderedDict()  # Текст запроса -> LatencyHistogram
+_recent = deque(maxlen=RECENT_QUERIES)
+
+
+def record_timing(name, seconds):
+    with _lock:
+        histogram = _paths.get(name)
+        if histogram is None:
+            histogram = _paths[name] = LatencyHistogram()
+        histogram.add(seconds)
+
+
+def _record_query(sql, params, seconds, rows):
+    key = " ".join(sql.split())
+    with _lock:
+        histogram = _queries.get(key)
+        if histogram is None:
+            histogram = _queries[key] = LatencyHistogram()
+            if len(_queries) > MAX_QUERIES:
+                _queries.popitem(last=False)
+        else:
+            _queries.move_to_end(key)
+        histogram.add(seconds, rows)
+        _recent.append({
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "thread": threading.current_thread().name,
+            "ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "sql": key[:SQL_PREVIEW],
+            "params": [repr(value)[:100] for value in params or ()],
+        })
+
+
+# Курсор SQLite, считающий выбранные строки. SQLite выполняет запрос по мере
+# чтения строк, поэтому длительность — время от execute до чтения последней
+# строки (включая разбор строк в peewee). Запрос записывается, когда курсор
+# исчерпан или закрыт; прочитанный не до конца (get(), first()) — при удалении
+class QueryCursor:
+    _recorded = True  # До конца __init__ курсор не записывается
+
+    def __init__(self, cursor, sql, params, started):
+        self._cursor = cursor
+        self._sql = sql
+        self._params = params
+        self._started = started
+        self._rows = 0
+        self._recorded = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size if size is not None else self._cursor.arraysize)
+        self._rows += len(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def _finish(self):
+        if not self._recorded:
+            self._recorded = True
+            _record_query(self._sql, self._params, time.perf_counter() - self._started, self._rows)
+
+    def __del__(self):
+        self._finish()
+
+
+def query_executed(cursor, sql, params, started):
+    # Вызывается базой после execute (started — perf_counter до него);
+    # возвращает курсор для дальнейшего чтения
+    if cursor.description is None:
+        # INSERT, UPDATE, DELETE и служебные команды: строк для чтения нет
+        _record_query(sql, params, time.perf_counter() - started, max(cursor.rowcount, 0))
+        return cursor
+    return QueryCursor(cursor, sql, params, started)
+
+
+# Замер пути интерфейса: with timed("AnalyticsTab.draw_chart"): ...
+class timed:
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if enabled:
+            record_timing(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def reset():
+    with _lock:
+        _paths.clear()
+        _queries.clear()
+        _recent.clear()
+
+
+def snapshot():
+    # Текущее состояние для вкладки отладки и JSON
+    with _lock:
+        paths = {name: histogram.summary() for name, histogram in _paths.items()}
+        queries = {sql: histogram.summary() for sql, histogram in _queries.items()}
+        recent = list(_recent)
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "histogram_edges_ms": list(HISTOGRAM_EDGES_MS),
+        "paths": {name: summary for name, summary in paths.items() if summary},
+        "queries": {sql: summary for sql, summary in queries.items() if summary},
+        "recent_queries": recent,
+    }
+
+
+def dump(path):
+    with open(path, "w", encoding="utf-8") as output:
+        json.dump(snapshot(), output, ensure_ascii=False, indent=2)
+
+
+# Профилирование cProfile. Профилировщик действует в своем потоке, поэтому
+# поток интерфейса и каждая фоновая задача профилируются отдельно, а при
+# остановке профили объединяются
+
+_profiler = None
+_task_profiles = []
+
+
+def profiling_active():
+    return _profiler is not None
+
+
+def start_profile():
+    global _profiler
+    if _profiler is None:
+        _task_profiles.clear()
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def stop_profile(path=None, limit=40):
+    # Останавливает профилирование; сохраняет профиль в path (формат pstats,
+    # открывается snakeviz, pstats) и возвращает текст с самыми дорогими функциями
+    global _profiler
+    if _profiler is None:
+        return ""
+    profiler, _profiler = _profiler, None
+    profiler.disable()
+    with _lock:
+        profiles = list(_task_profiles)
+        _task_profiles.clear()
+    text = io.StringIO()
+    stats = pstats.Stats(profiler, stream=text)
+    for task_profile in profiles:
+        stats.add(task_profile)
+    if path:
+        stats.dump_stats(path)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return text.getvalue()
+
+
+def profile_call(function, *args, **kwargs):
+    # Выполняет функцию фоновой задачи, профилируя ее, если профилирование включено
+    if _profiler is None:
+        return function(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        with _lock:
+            _task_profiles.append(profiler)
+
+
+def short_sql(sql, length=120):
+    # Сокращенный текст запроса для таблиц: список столбцов SELECT (до FROM
+    # верхнего уровня, не из подзапроса) заменяется на "…"
+    if sql.startswith("SELECT "):
+        depth = 0
+        for position, char in enumerate(sql):
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+            elif depth == 0 and sql.startswith(" FROM ", position):
+                sql = "SELECT …" + sql[position:]
+                break
+    return sql if len(sql) <= length else sql[:length - 1] + "…"
@@ -0,0 +1,74 @@
+import calendar
+from datetime import timedelta
+
+# Расписания регулярных операций (по образцу RRULE: частота, интервал,
+# дата начала, дата окончания UNTIL, число повторений COUNT). Дата
+# повторения с номером n вычисляется напрямую, без перебора предыдущих,
+# поэтому повторения разворачиваются только в запрошенном окне дат.
+# Для месячной и годовой частоты день месяца берется из даты начала;
+# в коротких месяцах — последний день месяца (31 -> 30 апреля, 28/29 февраля).
+
+FREQUENCIES = {
+    "day": "Ежедневно",
+    "week": "Еженедельно",
+    "month": "Ежемесячно",
+    "year": "Ежегодно",
+}
+# Шаг частоты: дни для day/week, месяцы для month/year
+STEP_DAYS = {"day": 1, "week": 7}
+STEP_MONTHS = {"month": 1, "year": 12}
+# Предел числа повторений одного правила в окне
+MAX_OCCURRENCES = 1000
+
+
+def add_months(day, months, day_of_month):
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day_of_month, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(start, frequency, interval, index):
+    # Дата повторения с номером index (0 — дата начала)
+    if frequency in STEP_DAYS:
+        return start + timedelta(days=STEP_DAYS[frequency] * interval * index)
+    if frequency in STEP_MONTHS:
+        return add_months(start, STEP_MONTHS[frequency] * interval * index, start.day)
+    raise ValueError(f"Неизвестная частота: {frequency}")
+
+
+def first_index(start, frequency, interval, day):
+    # Номер первого повторения не раньше day
+    if day <= start:
+        return 0
+    if frequency in STEP_DAYS:
+        step = STEP_DAYS[frequency] * interval
+        return -(-(day - start).days // step)
+    if frequency in STEP_MONTHS:
+        months = (day.year - start.year) * 12 + day.month - start.month
+        index = months // (STEP_MONTHS[frequency] * interval)
+        return index if occurrence(start, frequency, interval, index) >= day else index + 1
+    raise ValueError(f"Неизвестная частота: {frequency}")
+
+
+def is_active(index, day, end_date=None, count=None):
+    # Повторение с номером index на дату day входит в расписание
+    return (count is None or index < count) and (end_date is None or day <= end_date)
+
+
+def occurrences(start, frequency, interval, date_from, date_to, end_date=None, count=None,
+                after_index=0, limit=MAX_OCCURRENCES):
+    # Повторения (номер, дата) в окне [date_from, date_to], начиная с номера
+    # after_index; не больше limit. Генератор: даты вычисляются по мере чтения
+    index = max(first_index(start, frequency, interval, date_from), after_index)
+    for _ in range(limit):
+        day = occurrence(start, frequency, interval, index)
+        if day > date_to or not is_active(index, day, end_date, count):
+            return
+        yield index, day
+        index += 1
+
+
+def next_occurrence(start, frequency, interval, index, end_date=None, count=None):
+    # Дата повторения с номером index или None, если расписание закончилось
+    day = occurrence(start, frequency, interval, index)
+    return day if is_active(index, day, end_date, count) else None
@@ -0,0 +1,358 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from multiprocessing import get_context
+
+from peewee import chunked
+
+from models import (
+    db, init_db, Goal, Transaction, RecurringRule, Budget, budgets_with_spending, expenses_by_category,
+    totals_by_category_and_type, totals_by_date_and_type, totals_by_month_and_type, transaction_date_range,
+    balance_before, month_totals_by_category, goals_with_progress, read_snapshot, write_coalescer, notify, RESET,
+)
+from importer import import_transactions
+from exporter import export_transactions
+import recurring
+
+# Сервисный слой без Qt: операции, цели, регулярные операции, бюджеты,
+# данные графиков, отчеты, импорт, экспорт и отрисовка графиков в файл
+# (matplotlib Agg). Им пользуются вкладки приложения и командная строка
+# (cli.py). Во вкладках данные графиков, импорт и экспорт выполняются в
+# рабочем потоке (см. tasks.py), а добавление и удаление, бюджеты и проведение
+# регулярных операций — в потоке GUI. pandas и matplotlib импортируются при
+# первом использовании. Функции работают с базой, открытой init_db(); для
+# нескольких файлов базы см. run_for_databases.
+
+PIE_CHART = "Круговая (категории)"
+BAR_CHART = "Столбчатая (доходы/расходы)"
+LINE_CHART = "Линейная (динамика)"
+
+
+# Операции и цели
+
+# Записи идут через models.write_coalescer: в приложении мелкие изменения,
+# сделанные подряд, фиксируются одной транзакцией
+
+def add_transaction(amount, category, operation_date, operation_type, notes=""):
+    with write_coalescer.write():
+        return Transaction.create(amount=amount, category=category, date=operation_date,
+                                  type=operation_type, notes=notes)
+
+
+def delete_transactions(ids):
+    with write_coalescer.write():
+        return Transaction.delete_by_ids(ids)
+
+
+def add_goal(title, target_amount, current_amount, deadline, category=None, operation_type=None,
+             start_date=None):
+    # Цель без категории не привязана к операциям
+    with write_coalescer.write():
+        return Goal.create(
+            title=title,
+            target_amount=target_amount,
+            current_amount=current_amount,
+            deadline=deadline,
+            category=category,
+            type=operation_type if category else None,
+            start_date=start_date if category else None,
+        )
+
+
+def delete_goals(ids):
+    with write_coalescer.write():
+        return Goal.delete_by_ids(ids)
+
+
+# Регулярные операции. Наступившие повторения проводятся как обычные операции
+# (при запуске приложения, кнопкой на вкладке или командой cli recurring);
+# будущие разворачиваются только в запрошенном окне дат
+
+# Окно ближайших повторений по умолчанию, дней
+UPCOMING_DAYS = 30
+# Операций в одном INSERT при проведении повторений
+POST_BATCH_SIZE = 500
+
+
+def add_recurring_rule(title, amount, category, operation_type, frequency, start_date, interval=1,
+                       end_date=None, count=None, notes=""):
+    if frequency not in recurring.FREQUENCIES:
+        raise ValueError(f"Неизвестная частота: {frequency}")
+    if interval < 1 or (count is not None and count < 1):
+        raise ValueError("Интервал и число повторений должны быть положительными")
+    with write_coalescer.write():
+        return RecurringRule.create(
+            title=title, amount=amount, category=category, type=operation_type, notes=notes,
+            frequency=frequency, interval=interval, start_date=start_date, end_date=end_date,
+            count=count, next_index=0,
+            next_date=recurring.next_occurrence(start_date, frequency, interval, 0, end_date, count),
+        )
+
+
+def delete_recurring_rules(ids):
+    # Проведенные операции остаются
+    with write_coalescer.write():
+        return RecurringRule.delete_by_ids(ids)
+
+
+def post_recurring(until=None):
+    # Проводит повторения с датой не позже until (по умолчанию сегодня);
+    # возвращает число созданных операций
+    # Операции вставляются пачками, подписчики получают одно событие RESET
+    until = until or date.today()
+    rows = []
+    # IMMEDIATE: блокировка записи берется до чтения next_date/next_index, иначе
+    # при одновременном запуске (приложение и cli recurring) второй писатель
+    # получал бы "database is locked" вместо ожидания
+    with db.atomic("IMMEDIATE"):
+        for rule in list(RecurringRule.select().where(RecurringRule.next_date <= until)):
+            index = rule.next_index
+            # Повторения разворачиваются окнами по MAX_OCCURRENCES, пока не дойдут до until
+            while True:
+                days = [day for _, day in recurring.occurrences(
+                    rule.start_date, rule.frequency, rule.interval, rule.next_date, until,
+                    rule.end_date, rule.count, after_index=index)]
+                rows.extend((rule.amount, rule.category, day, rule.type, rule.notes or rule.title)
+                            for day in days)
+                index += len(days)
+                if len(days) < recurring.MAX_OCCURRENCES:
+                    break
+            rule.next_index = index
+            rule.next_date = recurring.next_occurrence(rule.start_date, rule.frequency, rule.interval,
+                                                       index, rule.end_date, rule.count)
+            rule.save(only=[RecurringRule.next_index, RecurringRule.next_date])
+        fields = [Transaction.amount, Transaction.category, Transaction.date, Transaction.type, Transaction.notes]
+        for batch in chunked(rows, POST_BATCH_SIZE):
+            Transaction.insert_many(batch, fields=fields).execute()
+    if rows:
+        notify(Transaction, RESET)
+    return len(rows)
+
+
+def upcoming_occurrences(date_from=None, date_to=None):
+    # Непроведенные повторения в окне дат (по умолчанию UPCOMING_DAYS дней
+    # от сегодня): (дата, название, сумма, категория, тип) по возрастанию даты
+    date_from = date_from or date.today()
+    date_to = date_to or date_from + timedelta(days=UPCOMING_DAYS)
+    upcoming = []
+    for rule in RecurringRule.select().where(RecurringRule.next_date <= date_to):
+        for _, day in recurring.occurrences(rule.start_date, rule.frequency, rule.interval,
+                                            date_from, date_to, rule.end_date, rule.count,
+                                            after_index=rule.next_index):
+            upcoming.append((day, rule.title, rule.amount, rule.category, rule.type))
+    upcoming.sort(key=lambda occurrence: occurrence[0])
+    return upcoming
+
+
+def recurring_report(days=UPCOMING_DAYS):
+    # Для командной строки: проводит наступившие повторения и возвращает ближайшие
+    posted = post_recurring()
+    today = date.today()
+    return {
+        "posted": posted,
+        "upcoming": [
+            {"date": day.isoformat(), "title": title, "amount": amount, "category": category, "type": operation_type}
+            for day, title, amount, category, operation_type in upcoming_occurrences(
+                today + timedelta(days=1), today + timedelta(days=days))
+        ],
+    }
+
+
+# Бюджеты
+
+def set_budget(category, amount, start_month=None, budget_id=None):
+    # Создает месячный бюджет категории или, если указан budget_id, изменяет
+    # этот бюджет. У категории может быть только один бюджет
+    start_month = start_month or date.today().strftime("%Y-%m")
+    with write_coalescer.write():
+        other = Budget.get_or_none((Budget.category == category) & (Budget.id != budget_id))
+        if other is not None:
+            raise ValueError(f"Для категории «{category}» бюджет уже задан")
+        budget = Budget(category=category) if budget_id is None else Budget.get_by_id(budget_id)
+        budget.category = category
+        budget.amount = amount
+        budget.start_month = start_month
+        budget.save()
+        return budget
+
+
+def delete_budgets(ids):
+    with write_coalescer.write():
+        return Budget.delete_by_ids(ids)
+
+
+def month_count(month_from, month_to):
+    # Число месяцев в [month_from, month_to] ("YYYY-MM"), 0 — если month_from позже
+    months = (int(month_to[:4]) - int(month_from[:4])) * 12 + int(month_to[5:7]) - int(month_from[5:7]) + 1
+    return max(months, 0)
+
+
+def budget_report(month_from=None, month_to=None):
+    # Бюджет против факта за месяцы [month_from, month_to] (по умолчанию — по текущий месяц)
+    month_to = month_to or date.today().strftime("%Y-%m")
+    month_from = month_from or month_to
+    report = []
+    for budget_id, category, amount, first_month, spent in budgets_with_spending(month_from, month_to):
+        months = month_count(first_month, month_to)
+        budget = round(amount * months, 2)
+        report.append({
+            "id": budget_id, "category": category, "monthly": amount, "months": months,
+            "budget": budget, "spent": round(spent, 2), "remaining": round(budget - spent, 2),
+            "percent": round(100 * spent / budget, 1) if budget else None,
+        })
+    return report
+
+
+# Данные графиков (агрегаты из итоговых таблиц в виде DataFrame)
+
+def pie_chart_data():
+    import pandas as pd
+
+    df = pd.DataFrame(list(expenses_by_category()), columns=["Категории", "amount"])
+    if df.empty:
+        raise ValueError("Нет данных для построения графика")
+    return df.set_index("Категории")
+
+
+def bar_chart_data():
+    import pandas as pd
+
+    df = pd.DataFrame(list(totals_by_category_and_type()), columns=["Категории", "Тип", "amount"])
+    if df.empty:
+        raise ValueError("Нет данных для построения графика")
+    return df.set_index(["Категории", "Тип"]).unstack(fill_value=0)
+
+
+def line_chart_data(bucket="auto", max_points=250, date_from=None, date_to=None):
+    # Суммы по датам в окне [date_from, date_to] (весь период, если окно не задано).
+    # Для интервалов от месяца читаются месячные итоги, иначе — дневные.
+    # "auto" выбирает интервал так, чтобы на окно пришлось не больше max_points точек
+    import pandas as pd
+    from timeseries import bucket_starts, choose_bucket
+
+    # Диапазон, итоги и начальный баланс читаются из одного состояния базы
+    with read_snapshot():
+        window = date_from is not None
+        if not window:
+            date_from, date_to = transaction_date_range()
+            if date_from is None:
+                raise ValueError("Нет данных для построения графика")
+        if bucket == "auto":
+            bucket = choose_bucket(date_from, date_to, max_points)
+        # Окно начинается с начала первого интервала (понедельник недели, первый
+        # день месяца или квартала), чтобы крайний левый интервал был полным
+        date_from = bucket_starts([date_from], bucket)[0].item()
+        if bucket in ("month", "quarter"):
+            df = pd.DataFrame(list(totals_by_month_and_type(date_from, date_to)), columns=["Дата", "Тип", "amount"])
+            df["Дата"] = pd.to_datetime(df["Дата"] + "-01")
+        else:
+            df = pd.DataFrame(list(totals_by_date_and_type(date_from, date_to)), columns=["Дата", "Тип", "amount"])
+            df["Дата"] = pd.to_datetime(df["Дата"])
+        if df.empty:
+            # В окне нет операций: пустые ряды, а не ошибка
+            df = pd.DataFrame(columns=pd.MultiIndex.from_product([["amount"], ["Доход", "Расход"]]),
+                              index=pd.DatetimeIndex([], name="Дата"), dtype=float)
+        else:
+            df = df.set_index(["Дата", "Тип"]).unstack(fill_value=0)
+        df.attrs.update(bucket=bucket, window=window, opening=balance_before(date_from) if window else 0)
+    return df
+
+
+CHART_DATA = {
+    PIE_CHART: pie_chart_data,
+    BAR_CHART: bar_chart_data,
+    LINE_CHART: line_chart_data,
+}
+
+
+def render_chart(chart_type, path, width=10.0, height=6.0, dpi=100, balance=False, **filters):
+    # Рисует график в файл (PNG, PDF, SVG — по расширению) без Qt, на холсте Agg.
+    # filters передаются функции данных графика (для линейного: bucket, date_from, date_to)
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    from charts import CHARTS
+
+    figure = Figure(figsize=(width, height), dpi=dpi)
+    FigureCanvasAgg(figure)
+    chart = CHARTS[chart_type](figure.add_subplot(111))
+    if chart_type == LINE_CHART:
+        pixels = int(width * dpi)
+        filters.setdefault("max_points", pixels // chart.PIXELS_PER_BUCKET)
+        chart.options = (balance, pixels)
+    chart.draw(CHART_DATA[chart_type](**filters))
+    figure.savefig(path)
+    return path
+
+
+# Отчеты
+
+def monthly_report(month=None):
+    # Итоги месяца "YYYY-MM" (по умолчанию текущего) по категориям и прогресс целей
+    month = month or date.today().strftime("%Y-%m")
+    report = {"month": month, "income": {}, "expense": {}, "count": 0}
+    with read_snapshot():
+        for operation_type, category, total, count in month_totals_by_category(month):
+            report["income" if operation_type == "Доход" else "expense"][category] = round(total, 2)
+            report["count"] += count
+        report["goals"] = goals_report()
+    report["income_total"] = round(sum(report["income"].values()), 2)
+    report["expense_total"] = round(sum(report["expense"].values()), 2)
+    report["balance"] = round(report["income_total"] - report["expense_total"], 2)
+    return report
+
+
+def goals_report():
+    return [
+        {"title": title, "category": category, "target": target, "progress": round(progress, 2),
+         "percent": percent, "projected": projected, "deadline": deadline}
+        for title, category, target, progress, percent, projected, deadline in goals_with_progress()
+    ]
+
+
+# Импорт и экспорт (прогресс и отмена — как в importer/exporter)
+
+def import_file(path, progress=None, check_cancelled=None):
+    return import_transactions(path, progress=progress, check_cancelled=check_cancelled)
+
+
+def export_file(path, date_from=None, date_to=None, operation_type=None, progress=None, check_cancelled=None):
+    return export_transactions(path, date_from, date_to, operation_type,
+                               progress=progress, check_cancelled=check_cancelled)
+
+
+# Несколько файлов базы: каждая база обрабатывается в отдельном процессе.
+# Процессы запускаются методом spawn, чтобы не наследовать соединение
+# с базой родительского процесса
+
+def run_in_database(path, function, *args, **kwargs):
+    # Открывает базу path, вызывает function(*args, **kwargs) и закрывает базу
+    init_db(path)
+    try:
+        return function(*args, **kwargs)
+    finally:
+        # Соединения пула закрываются, а не возвращаются в него: файл базы
+        # освобождается, журнал WAL переносится в базу
+        db.close_all()
+
+
+def run_jobs(jobs, processes=None):
+    # jobs — словарь {путь к базе: (функция, args, kwargs)}; функции — уровня модуля.
+    # Возвращает словарь {путь: результат}; исключение в одной базе возвращается
+    # как ее результат, остальные базы обрабатываются
+    processes = processes or min(len(jobs), os.cpu_count() or 1)
+    results = {}
+    with ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn")) as pool:
+        futures = {path: pool.submit(run_in_database, path, function, *args, **kwargs)
+                   for path, (function, args, kwargs) in jobs.items()}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = e
+    return results
+
+
+def run_for_databases(paths, function, *args, processes=None, **kwargs):
+    # Вызывает function(*args, **kwargs) для каждой базы из paths
+    return run_jobs({path: (function, args, kwargs) for path in paths}, processes)
@@ -0,0 +1,129 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from models import db, write_coalescer
+import profiling
+
+
+# Исключение, которым задача прерывает работу после отмены
+class TaskCancelled(Exception):
+    pass
+
+
+# Сигналы задачи: создаются в потоке GUI, поэтому обработчики
+# вызываются в нем же, даже если сигнал отправлен из рабочего потока
+class TaskSignals(QObject):
+    finished = pyqtSignal(object)  # Результат функции
+    failed = pyqtSignal(str)       # Текст ошибки
+    progress = pyqtSignal(int)     # Прогресс в процентах
+    done = pyqtSignal()            # Задача завершилась (в том числе отмененная)
+
+
+# Задача для пула потоков. Функция получает задачу первым аргументом:
+# через нее она сообщает о прогрессе и проверяет, не отменена ли она
+class Task(QRunnable):
+    def __init__(self, function, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check_cancelled(self):
+        # Прерывает выполнение, если задача отменена
+        if self.cancelled:
+            raise TaskCancelled()
+
+    def report_progress(self, percent):
+        if not self.cancelled:
+            self._emit("progress", int(percent))
+
+    def _emit(self, name, *args):
+        # При закрытии приложения объект сигналов может быть уже удален Qt
+        try:
+            getattr(self.signals, name).emit(*args)
+        except RuntimeError:
+            self.cancelled = True
+
+    def run(self):
+        try:
+            with profiling.timed(f"task.{self.function.__qualname__}"):
+                result = profiling.profile_call(self.function, self, *self.args, **self.kwargs)
+        except TaskCancelled:
+            pass
+        except Exception as e:
+            if not self.cancelled:
+                self._emit("failed", str(e))
+        else:
+            if not self.cancelled:
+                self._emit("finished", result)
+        finally:
+            # Соединение рабочего потока возвращается в пул до следующей задачи
+            if not db.is_closed():
+                db.close()
+            self._emit("done")
+
+
+# Запускает задачи в пуле потоков. Задачи сгруппированы по каналам:
+# новая задача канала отменяет предыдущую, и ее устаревший результат отбрасывается
+class TaskRunner(QObject):
+    busy_changed = pyqtSignal(bool)  # Есть ли незавершенные задачи
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self._current = {}    # Канал -> последняя задача
+        self._running = set() # Ссылки на запущенные задачи
+
+    def run(self, channel, function, *args, on_result=None, on_error=None, on_progress=None, **kwargs):
+        previous = self._current.get(channel)
+        if previous is not None:
+            previous.cancel()
+        # Задача читает базу из своего соединения и должна видеть
+        # отложенные записи интерфейса
+        write_coalescer.flush()
+
+        task = Task(function, *args, **kwargs)
+        self._current[channel] = task
+        self._running.add(task)
+
+        def finished(result):
+            if self._current.get(channel) is task and on_result is not None:
+                on_result(result)
+
+        def failed(message):
+            if self._current.get(channel) is task and on_error is not None:
+                on_error(message)
+
+        task.signals.finished.connect(finished)
+        task.signals.failed.connect(failed)
+        task.signals.done.connect(lambda: self._finish(channel, task))
+        if on_progress is not None:
+            task.signals.progress.connect(
+                lambda percent: self._current.get(channel) is task and on_progress(percent)
+            )
+        if len(self._running) == 1:
+            self.busy_changed.emit(True)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, channel):
+        # Отменяет текущую задачу канала
+        task = self._current.pop(channel, None)
+        if task is not None:
+            task.cancel()
+            self._discard(task)
+
+    def _finish(self, channel, task):
+        if self._current.get(channel) is task:
+            del self._current[channel]
+        self._discard(task)
+
+    def _discard(self, task):
+        if task in self._running:
+            self._running.discard(task)
+            if not self._running:
+                self.busy_changed.emit(False)
@@ -0,0 +1,86 @@
+import numpy as np
+
+# Временные ряды для линейного графика: суммы по интервалам (день, неделя,
+# месяц, квартал), автоматический выбор интервала по ширине графика,
+# прореживание LTTB до бюджета точек и накопительные ряды. Все операции
+# векторные (NumPy), даты — массивы datetime64[D].
+
+BUCKETS = ("day", "week", "month", "quarter")
+# Примерная длина интервала в днях — для выбора интервала по диапазону дат
+BUCKET_DAYS = {"day": 1, "week": 7, "month": 30.44, "quarter": 91.31}
+
+
+def bucket_starts(dates, bucket):
+    # Начало интервала для каждой даты
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if bucket == "day":
+        return dates
+    if bucket == "week":
+        # 1970-01-01 — четверг: сдвиг +3 дает номер дня от понедельника
+        days = dates.astype(np.int64)
+        return (days - (days + 3) % 7).astype("datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    if bucket == "quarter":
+        month_numbers = months.astype(np.int64)
+        months = (month_numbers - month_numbers % 3).astype("datetime64[M]")
+    if bucket == "month" or bucket == "quarter":
+        return months.astype("datetime64[D]")
+    raise ValueError(f"Неизвестный интервал: {bucket}")
+
+
+def aggregate(dates, values, bucket):
+    # Суммирует ряды values (список массивов той же длины, что dates) по интервалам.
+    # Возвращает (начала интервалов, [суммы по каждому ряду])
+    starts = bucket_starts(dates, bucket)
+    keys, inverse = np.unique(starts, return_inverse=True)
+    sums = [np.bincount(inverse, weights=np.asarray(series, dtype=float), minlength=len(keys))
+            for series in values]
+    return keys, sums
+
+
+def choose_bucket(first, last, max_points):
+    # Наименьший интервал, при котором число точек на диапазоне не превышает max_points
+    span = int((np.datetime64(last, "D") - np.datetime64(first, "D")).astype(np.int64)) + 1
+    for bucket in BUCKETS:
+        if span / BUCKET_DAYS[bucket] <= max_points:
+            return bucket
+    return BUCKETS[-1]
+
+
+def lttb(x, y, threshold):
+    # Прореживание Largest-Triangle-Three-Buckets: сохраняет форму ряда,
+    # оставляя не более threshold точек (первая и последняя — всегда)
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return x, y
+    xs = x.astype("datetime64[D]").astype(np.float64) if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+
+    # Границы корзин для внутренних точек
+    edges = np.linspace(1, length - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        # Средняя точка следующей корзины (для последней — последняя точка ряда)
+        next_start = end
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else length
+        next_end = max(next_end, next_start + 1)
+        mean_x = xs[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+        # Площадь треугольника (предыдущая выбранная, кандидат, среднее следующей)
+        areas = np.abs(
+            (xs[previous] - mean_x) * (y[start:end] - y[previous])
+            - (xs[previous] - xs[start:end]) * (mean_y - y[previous])
+        )
+        previous = start + int(areas.argmax())
+        selected[bucket + 1] = previous
+    return x[selected], y[selected]
+
+
+def running_balance(income, expense):
+    # Баланс нарастающим итогом
+    return np.cumsum(np.asarray(income, dtype=float) - np.asarray(expense, dtype=float))
@@ -1,14 +1,317 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, 
     QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QMessageBox, QMenu,
-    QComboBox, QHBoxLayout, QFileDialog, QGraphicsOpacityEffect, QLabel,QCalendarWidget
+    QComboBox, QHBoxLayout, QFileDialog, QGraphicsOpacityEffect, QLabel,QCalendarWidget,
+    QTableView, QProgressBar, QCheckBox, QDateEdit, QTabWidget, QPlainTextEdit, QSpinBox
 )
-from PyQt6.QtCore import Qt, QPropertyAnimation
-from models import Goal, Transaction
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-import pandas as pd
-from datetime import datetime
+from PyQt6.QtCore import (
+    Qt, QPropertyAnimation, QAbstractTableModel, QModelIndex, pyqtSignal, QDate, QTimer, QObject
+)
+from PyQt6.QtGui import QColor
+from models import (
+    Goal, Transaction, RecurringRule, Budget, subscribe, unsubscribe, data_version, database_version, INSERT, UPDATE, DELETE,
+    transaction_filter, transaction_categories, goal_progress, goal_percent, goal_projected_date
+)
+from peewee import Tuple, Value
+from datetime import date, timedelta
+import os
+from bisect import bisect_left
+from tasks import TaskRunner
+import profiling
+import services
+from services import LINE_CHART
+from recurring import FREQUENCIES
+
+
+# Ключ в обратном порядке: bisect по строкам, отсортированным по убыванию
+class _Descending:
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+# Базовая модель таблицы: строки подгружаются страницами по мере прокрутки
+# (keyset-пагинация по столбцу сортировки и id), в памяти хранятся только
+# кортежи значений. Отбор строк (where) и сортировка выполняются в SQL.
+# Изменения строк в базе применяются точечно, без перечитывания таблицы.
+class LazyTableModel(QAbstractTableModel):
+    PAGE_SIZE = 500
+
+    model_class = None  # Модель peewee, из которой читаются строки
+    fields = ()         # Поля модели, отображаемые в столбцах
+    headers = ()        # Заголовки столбцов
+
+    # Сигнал-посредник: события из models доставляются в поток GUI
+    rows_changed = pyqtSignal(str, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []     # Загруженные строки в порядке таблицы: (id, значение столбца 0, ...)
+        self._by_id = {}    # id -> загруженная строка (по ней находится ключ порядка)
+        self._last_key = None  # Ключ порядка последней загруженной строки
+        self._exhausted = False
+        self.where = None       # Условие отбора строк (выражение peewee)
+        self.sort_column = -1   # Столбец сортировки; -1 — по id
+        self.descending = False
+
+        self.rows_changed.connect(self.apply_change)
+        notify_callback = self.rows_changed.emit
+        model_class = self.model_class
+        subscribe(model_class, notify_callback)
+        self.destroyed.connect(lambda: unsubscribe(model_class, notify_callback))
+
+    def order_fields(self):
+        # Поля порядка строк: (столбец сортировки, id) или только id
+        pk = self.model_class._meta.primary_key
+        if self.sort_column < 0:
+            return [pk]
+        return [self.fields[self.sort_column], pk]
+
+    def order_key(self, row):
+        # Ключ строки в порядке order_fields
+        if self.sort_column < 0:
+            return (row[0],)
+        return (row[self.sort_column + 1], row[0])
+
+    def select(self):
+        query = self.model_class.select(self.model_class._meta.primary_key, *self.fields)
+        if self.where is not None:
+            query = query.where(self.where)
+        return query
+
+    def page_query(self, after_key, limit):
+        # Следующая страница строк после ключа after_key (None — с начала).
+        # Сравнение кортежей (столбец, id) > (?, ?) использует индекс столбца
+        fields = self.order_fields()
+        query = self.select()
+        if after_key is not None:
+            after = Tuple(*[Value(value, converter=field.db_value) for field, value in zip(fields, after_key)])
+            query = query.where(Tuple(*fields) < after if self.descending else Tuple(*fields) > after)
+        return (query
+                .order_by(*[field.desc() if self.descending else field for field in fields])
+                .limit(limit)
+                .tuples())
+
+    def rows_query(self, ids):
+        # Строки с указанными id, подходящие под условие отбора
+        pk = self.model_class._meta.primary_key
+        return self.select().where(pk.in_(ids)).tuples()
+
+    def format_value(self, column, value):
+        # Текст ячейки для значения столбца
+        return str(value)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self.format_value(index.column(), self._rows[index.row()][index.column() + 1])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        with profiling.timed(f"{type(self).__name__}.fetchMore"):
+            rows = list(self.page_query(self._last_key, self.PAGE_SIZE))
+        if len(rows) < self.PAGE_SIZE:
+            self._exhausted = True
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self._by_id.update((row[0], row) for row in rows)
+        self.endInsertRows()
+        self._last_key = self.order_key(rows[-1])
+
+    def reload(self):
+        # Сбрасывает загруженные строки; первая страница подгрузится по запросу представления
+        self.beginResetModel()
+        self._rows = []
+        self._by_id = {}
+        self._last_key = None
+        self._exhausted = False
+        self.endResetModel()
+
+    def set_filter(self, where):
+        # Новое условие отбора; строки перечитываются с начала
+        self.where = where
+        self.reload()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        # Сортировка по щелчку на заголовке выполняется запросом к базе
+        self.sort_column = column
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.reload()
+
+    def row_id(self, row):
+        # Первичный ключ строки таблицы
+        return self._rows[row][0]
+
+    def find_row(self, row_id):
+        # Номер строки с указанным id или -1, если строка не загружена.
+        # Ключ порядка берется из загруженной строки, место — двоичным поиском
+        row = self._by_id.get(row_id)
+        if row is None:
+            return -1
+        return self._position(self.order_key(row))
+
+    def _follows(self, key, other):
+        # Строка с ключом key идет в таблице после строки с ключом other
+        return key < other if self.descending else key > other
+
+    def _position(self, key):
+        # Место строки с ключом key в порядке таблицы (двоичный поиск)
+        if self.descending:
+            return bisect_left(self._rows, _Descending(key), key=lambda row: _Descending(self.order_key(row)))
+        return bisect_left(self._rows, key, key=self.order_key)
+
+    def apply_change(self, action, ids):
+        # Применяет событие об изменении строк к загруженной части таблицы
+        with profiling.timed(f"{type(self).__name__}.apply_change"):
+            if ids is None:
+                self.reload()
+            elif action == INSERT:
+                self._insert_rows(ids)
+            elif action == UPDATE:
+                self._update_rows(ids)
+            elif action == DELETE:
+                self._remove_rows(ids)
+
+    def _insert_rows(self, ids):
+        # Строки за пределами загруженного диапазона подгрузятся вместе со следующей страницей
+        if self._last_key is None and not self._exhausted:
+            return
+        for row in self.rows_query(ids):
+            key = self.order_key(row)
+            if row[0] in self._by_id or (not self._exhausted and self._follows(key, self._last_key)):
+                continue
+            position = self._position(key)
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._rows.insert(position, row)
+            self._by_id[row[0]] = row
+            self.endInsertRows()
+            self._last_key = self.order_key(self._rows[-1])
+
+    def _update_rows(self, ids):
+        # Строки, сохранившие место в порядке, обновляются на месте; сменившие
+        # место, переставшие или начавшие подходить под отбор — переставляются
+        fresh = {row[0]: row for row in self.rows_query(ids)}
+        moved = []
+        for row_id in ids:
+            position = self.find_row(row_id)
+            row = fresh.get(row_id)
+            if position >= 0 and row is not None and self.order_key(row) == self.order_key(self._rows[position]):
+                self._rows[position] = self._by_id[row_id] = row
+                self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.headers) - 1))
+            elif position >= 0 or row is not None:
+                moved.append(row_id)
+        if moved:
+            self._remove_rows(moved)
+            self._insert_rows(moved)
+
+    def _remove_rows(self, ids):
+        # Удаляет строки непрерывными диапазонами, начиная с конца таблицы
+        positions = sorted({self.find_row(row_id) for row_id in ids} - {-1}, reverse=True)
+        while positions:
+            last = first = positions.pop(0)
+            while positions and positions[0] == first - 1:
+                first = positions.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for row in self._rows[first:last + 1]:
+                del self._by_id[row[0]]
+            del self._rows[first:last + 1]
+            self.endRemoveRows()
+
+    def selected_ids(self, view):
+        # id строк, выделенных в представлении
+        return [self.row_id(index.row()) for index in view.selectionModel().selectedRows()]
+
+
+# Перечитывание вкладки после изменения данных: события об изменении строк
+# моделей доставляются в поток GUI через сигнал-посредник (как в LazyTableModel),
+# а callback вызывается через delay мс после последнего из серии изменений —
+# серия изменений приводит к одному перечитыванию. Подписка снимается вместе
+# с родительским виджетом
+class ChangeWatcher(QObject):
+    changed = pyqtSignal(str, object)
+
+    def __init__(self, parent, model_classes, callback, delay=300):
+        super().__init__(parent)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay)
+        self.timer.timeout.connect(callback)
+        self.changed.connect(lambda action, ids: self.timer.start())
+        notify_callback = self.changed.emit
+        for model_class in model_classes:
+            subscribe(model_class, notify_callback)
+        self.destroyed.connect(lambda: [unsubscribe(model_class, notify_callback)
+                                        for model_class in model_classes])
+
+
+# Записи интерфейса во время импорта. Задача импорта держит блокировку записи
+# базы до конца (BEGIN IMMEDIATE, см. importer.py), и запись из потока GUI
+# ждала бы ее до busy_timeout, замораживая окно. Пока идет импорт, кнопки
+# и действия, изменяющие данные, отключены
+class WriteGuard(QObject):
+    locked_changed = pyqtSignal(bool)
+
+    def __init__(self):
+        super().__init__()
+        self.locked = False
+
+    def set_locked(self, locked):
+        self.locked = locked
+        self.locked_changed.emit(locked)
+
+    def bind(self, *widgets):
+        # Виджеты отключаются на время импорта
+        for widget in widgets:
+            widget.setDisabled(self.locked)
+            self.locked_changed.connect(widget.setDisabled)
+
+write_guard = WriteGuard()
+
+
+class GoalTableModel(LazyTableModel):
+    model_class = Goal
+    # Накопленное, процент и прогноз вычисляются в том же запросе
+    fields = (Goal.title, Goal.category, Goal.target_amount, goal_progress, goal_percent,
+              goal_projected_date, Goal.deadline)
+    headers = ("Название", "Категория", "Целевая сумма", "Накоплено", "Выполнено", "Прогноз", "Дедлайн")
+
+    def format_value(self, column, value):
+        if value is None:
+            return "—"
+        if column == 3:
+            return f"{value:.2f}"
+        if column == 4:
+            return f"{value:g}%"
+        return str(value)
+
+
+class TransactionTableModel(LazyTableModel):
+    model_class = Transaction
+    fields = (Transaction.amount, Transaction.category, Transaction.date, Transaction.type, Transaction.notes)
+    headers = ("Сумма", "Категория", "Дата", "Тип", "Примечание")
+
 
 # Диалог для добавления цели с анимацией появления (fade in)
 class AddGoalDialog(QDialog):
@@ -20,6 +323,15 @@ class AddGoalDialog(QDialog):
         self.title_input = QLineEdit()
         self.target_amount_input = QLineEdit()
         self.current_amount_input = QLineEdit()
+        # Привязка к операциям: их суммы добавляются к накопленному
+        self.category_input = QComboBox()
+        self.category_input.setEditable(True)
+        self.category_input.addItems([""] + transaction_categories())
+        self.type_input = QComboBox()
+        self.type_input.addItems(["Доход", "Расход"])
+        self.start_date_input = QDateEdit(QDate.currentDate())
+        self.start_date_input.setCalendarPopup(True)
+        self.start_date_input.setDisplayFormat("dd.MM.yyyy")
         self.calendar = QCalendarWidget()
         self.calendar.setGridVisible(True)
         self.selected_date_label = QLabel("Выберите дату")
@@ -34,6 +346,9 @@ class AddGoalDialog(QDialog):
         form_layout.addRow("Название цели:", self.title_input)
         form_layout.addRow("Целевая сумма:", self.target_amount_input)
         form_layout.addRow("Текущая сумма:", self.current_amount_input)
+        form_layout.addRow("Пополняется операциями категории:", self.category_input)
+        form_layout.addRow("Тип операций:", self.type_input)
+        form_layout.addRow("Учитывать операции с:", self.start_date_input)
         form_layout.addRow("Дедлайн:", self.selected_date_label)
         form_layout.addRow(self.calendar)
         form_layout.addRow(buttons)
@@ -65,6 +380,9 @@ class AddGoalDialog(QDialog):
             "target_amount": self.target_amount_input.text(),
             "current_amount": self.current_amount_input.text(),
             "deadline": self.calendar.selectedDate().toString("yyyy-MM-dd"),
+            "category": self.category_input.currentText().strip() or None,
+            "type": self.type_input.currentText(),
+            "start_date": self.start_date_input.date().toPyDate(),
         }
 class BalanceTab(QWidget):
     def __init__(self):
@@ -94,9 +412,11 @@ class GoalsTab(QWidget):
         layout = QVBoxLayout()
 
         # Таблица для отображения целей
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Название", "Целевая сумма", "Текущая сумма", "Дедлайн"])
+        self.model = GoalTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.ExtendedSelection)
         self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
         layout.addWidget(self.table)
@@ -104,8 +424,13 @@ class GoalsTab(QWidget):
         # Кнопка для добавления цели
         self.add_button = QPushButton("Добавить цель")
         self.add_button.clicked.connect(self.show_add_goal_dialog)
+        write_guard.bind(self.add_button)
         layout.addWidget(self.add_button)
 
+        # Накопленное по целям меняется вместе с операциями: после серии
+        # изменений таблица целей перечитывается одним запросом
+        self.watcher = ChangeWatcher(self, (Transaction,), self.load_goals)
+
         self.setLayout(layout)
         self.load_goals()
 
@@ -123,14 +448,8 @@ class GoalsTab(QWidget):
     def load_goals(self):
         # Загружает цели из базы данных и отображает их в таблице
         try:
-            self.table.setRowCount(0)
-            for goal in Goal.select():
-                row_position = self.table.rowCount()
-                self.table.insertRow(row_position)
-                self.table.setItem(row_position, 0, QTableWidgetItem(goal.title))
-                self.table.setItem(row_position, 1, QTableWidgetItem(str(goal.target_amount)))
-                self.table.setItem(row_position, 2, QTableWidgetItem(str(goal.current_amount)))
-                self.table.setItem(row_position, 3, QTableWidgetItem(goal.deadline))
+            with profiling.timed("GoalsTab.load_goals"):
+                self.model.reload()
         except Exception as e:
             print(f"Ошибка при загрузке целей: {e}")
 
@@ -142,13 +461,12 @@ class GoalsTab(QWidget):
                 data = dialog.get_data()
                 target_amount = float(data["target_amount"])
                 current_amount = float(data["current_amount"])
-                Goal.create(
-                    title=data["title"],
-                    target_amount=target_amount,
-                    current_amount=current_amount,
-                    deadline=data["deadline"],
+                services.add_goal(
+                    data["title"], target_amount, current_amount, data["deadline"],
+                    category=data["category"],
+                    operation_type=data["type"],
+                    start_date=data["start_date"],
                 )
-                self.load_goals()
             except ValueError:
                 QMessageBox.critical(self, "Ошибка", "Сумма должна быть числом!")
             except Exception as e:
@@ -158,21 +476,22 @@ class GoalsTab(QWidget):
         """Показывает контекстное меню для таблицы целей."""
         menu = QMenu(self)
         delete_action = menu.addAction("Удалить цель")
+        delete_action.setDisabled(write_guard.locked)
         delete_action.triggered.connect(self.delete_selected_goal)
         menu.exec(self.table.viewport().mapToGlobal(position))
 
     def delete_selected_goal(self):
-        # Удаляет выбранную цель
-        selected_row = self.table.currentRow()
-        if selected_row >= 0:
-            goal_id = Goal.select()[selected_row].id
+        # Удаляет выбранные цели
+        goal_ids = self.model.selected_ids(self.table)
+        if goal_ids:
+            question = ("Вы уверены, что хотите удалить эту цель?" if len(goal_ids) == 1
+                        else f"Вы уверены, что хотите удалить выбранные цели ({len(goal_ids)})?")
             reply = QMessageBox.question(
-                self, "Удаление цели", "Вы уверены, что хотите удалить эту цель?",
+                self, "Удаление цели", question,
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             if reply == QMessageBox.StandardButton.Yes:
-                Goal.delete_by_id(goal_id)
-                self.load_goals()
+                services.delete_goals(goal_ids)
 
 # Диалог для добавления операции с анимацией появления (fade in)
 class AddTransactionDialog(QDialog):
@@ -187,6 +506,7 @@ class AddTransactionDialog(QDialog):
         self.calendar2.setGridVisible(True)
         self.select_date = QLabel('Выберите дату')
         self.type_input = QLineEdit()
+        self.notes_input = QLineEdit()
 
         # Кнопки "ОК" и "Отмена"
         buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
@@ -200,6 +520,7 @@ class AddTransactionDialog(QDialog):
         form_layout.addRow("Дата:", self.select_date)
         form_layout.addRow(self.calendar2)
         form_layout.addRow("Тип (Доход/Расход):", self.type_input)
+        form_layout.addRow("Примечание:", self.notes_input)
         form_layout.addRow(buttons)
 
         self.setLayout(form_layout)
@@ -229,9 +550,56 @@ class AddTransactionDialog(QDialog):
             "Категория": self.category_input.text(),
             "Дата": self.calendar2.selectedDate().toString("yyyy-MM-dd"),
             "Тип": self.type_input.text(),
+            "Примечание": self.notes_input.text(),
         }
 
 
+# Форматы экспорта: фильтр диалога сохранения -> расширение по умолчанию
+EXPORT_FILTERS = {
+    "Excel Files (*.xlsx)": ".xlsx",
+    "CSV (*.csv)": ".csv",
+    "Parquet (*.parquet)": ".parquet",
+}
+
+# Диалог выбора операций для экспорта: период и тип
+class ExportDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Экспорт операций")
+
+        self.period_check = QCheckBox("Только за период")
+        self.date_from = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.date_to = QDateEdit(QDate.currentDate())
+        for date_edit in (self.date_from, self.date_to):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("dd.MM.yyyy")
+            date_edit.setEnabled(False)
+            self.period_check.toggled.connect(date_edit.setEnabled)
+        self.type_input = QComboBox()
+        self.type_input.addItems(["Все", "Доход", "Расход"])
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        form_layout = QFormLayout()
+        form_layout.addRow(self.period_check)
+        form_layout.addRow("С:", self.date_from)
+        form_layout.addRow("По:", self.date_to)
+        form_layout.addRow("Тип:", self.type_input)
+        form_layout.addRow(buttons)
+        self.setLayout(form_layout)
+
+    def get_filters(self):
+        # Возвращает (дата с, дата по, тип); None — без ограничения
+        if self.period_check.isChecked():
+            date_from = self.date_from.date().toString("yyyy-MM-dd")
+            date_to = self.date_to.date().toString("yyyy-MM-dd")
+        else:
+            date_from = date_to = None
+        operation_type = self.type_input.currentText() if self.type_input.currentIndex() > 0 else None
+        return date_from, date_to, operation_type
+
 # Вкладка для работы с операциями с анимацией fade in
 class TransactionsTab(QWidget):
     def __init__(self):
@@ -242,10 +610,61 @@ class TransactionsTab(QWidget):
     def initUI(self):
         layout = QVBoxLayout()
 
-        # Таблица для отображения операций
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Сумма", "Категория", "Дата", "Тип"])
+        # Панель фильтров: условия собираются в один SQL-запрос
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Поиск по категории и примечанию")
+        self.period_check = QCheckBox("Период")
+        self.date_from = QDateEdit(QDate.currentDate().addMonths(-1))
+        self.date_to = QDateEdit(QDate.currentDate())
+        for date_edit in (self.date_from, self.date_to):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("dd.MM.yyyy")
+            date_edit.setEnabled(False)
+            self.period_check.toggled.connect(date_edit.setEnabled)
+        self.type_filter = QComboBox()
+        self.type_filter.addItems(["Все", "Доход", "Расход"])
+        self.category_filter = QComboBox()
+        self.category_filter.setEditable(True)
+        self.category_filter.setMinimumWidth(150)
+        self.category_filter.lineEdit().setPlaceholderText("Категория")
+        self.amount_min = QLineEdit()
+        self.amount_min.setPlaceholderText("Сумма от")
+        self.amount_max = QLineEdit()
+        self.amount_max.setPlaceholderText("Сумма до")
+        self.reset_filters_button = QPushButton("Сбросить")
+        self.reset_filters_button.clicked.connect(self.reset_filters)
+
+        # Фильтр применяется с небольшой задержкой после последнего изменения
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(250)
+        self.filter_timer.timeout.connect(self.apply_filters)
+        for signal in (self.search_input.textChanged, self.period_check.toggled,
+                       self.date_from.dateChanged, self.date_to.dateChanged,
+                       self.type_filter.currentIndexChanged, self.category_filter.currentTextChanged,
+                       self.amount_min.textChanged, self.amount_max.textChanged):
+            signal.connect(lambda *args: self.filter_timer.start())
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.search_input, 2)
+        filter_layout.addWidget(self.period_check)
+        filter_layout.addWidget(self.date_from)
+        filter_layout.addWidget(self.date_to)
+        filter_layout.addWidget(self.type_filter)
+        filter_layout.addWidget(self.category_filter)
+        filter_layout.addWidget(self.amount_min)
+        filter_layout.addWidget(self.amount_max)
+        filter_layout.addWidget(self.reset_filters_button)
+        layout.addLayout(filter_layout)
+
+        # Таблица для отображения операций; сортировка по щелчку на заголовке
+        self.model = TransactionTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.ExtendedSelection)
         self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
         layout.addWidget(self.table)
@@ -253,8 +672,22 @@ class TransactionsTab(QWidget):
         # Кнопка для добавления операции
         self.add_button = QPushButton("Добавить операцию")
         self.add_button.clicked.connect(self.show_add_transaction_dialog)
+        write_guard.bind(self.add_button)
         layout.addWidget(self.add_button)
 
+        # Импорт из файла выполняется в рабочем потоке
+        self.runner = TaskRunner(self)
+        self.import_button = QPushButton("Импорт из файла")
+        self.import_button.clicked.connect(self.import_from_file)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        self.runner.busy_changed.connect(self.progress_bar.setVisible)
+        self.runner.busy_changed.connect(lambda busy: self.import_button.setEnabled(not busy))
+        import_layout = QHBoxLayout()
+        import_layout.addWidget(self.import_button)
+        import_layout.addWidget(self.progress_bar)
+        layout.addLayout(import_layout)
+
         self.setLayout(layout)
         self.load_transactions()
 
@@ -272,17 +705,51 @@ class TransactionsTab(QWidget):
     def load_transactions(self):
         # Загружает операции из базы данных и отображает их в таблице
         try:
-            self.table.setRowCount(0)
-            for transaction in Transaction.select():
-                row_position = self.table.rowCount()
-                self.table.insertRow(row_position)
-                self.table.setItem(row_position, 0, QTableWidgetItem(str(transaction.amount)))
-                self.table.setItem(row_position, 1, QTableWidgetItem(transaction.category))
-                self.table.setItem(row_position, 2, QTableWidgetItem(transaction.date))
-                self.table.setItem(row_position, 3, QTableWidgetItem(transaction.type))
+            with profiling.timed("TransactionsTab.load_transactions"):
+                self.load_categories()
+                self.model.reload()
         except Exception as e:
             print(f"Ошибка при загрузке операций: {e}")
 
+    def load_categories(self):
+        # Список категорий для фильтра; введенный текст сохраняется
+        text = self.category_filter.currentText()
+        self.category_filter.blockSignals(True)
+        self.category_filter.clear()
+        self.category_filter.addItems([""] + transaction_categories())
+        self.category_filter.setEditText(text)
+        self.category_filter.blockSignals(False)
+
+    def filters(self):
+        # Условие отбора из полей панели фильтров; некорректная сумма не учитывается
+        def amount(line_edit):
+            try:
+                return float(line_edit.text().replace(" ", "").replace(",", "."))
+            except ValueError:
+                return None
+
+        period = self.period_check.isChecked()
+        return transaction_filter(
+            date_from=self.date_from.date().toPyDate() if period else None,
+            date_to=self.date_to.date().toPyDate() if period else None,
+            operation_type=self.type_filter.currentText() if self.type_filter.currentIndex() > 0 else None,
+            category=self.category_filter.currentText().strip() or None,
+            amount_min=amount(self.amount_min),
+            amount_max=amount(self.amount_max),
+            text=self.search_input.text(),
+        )
+
+    def apply_filters(self):
+        with profiling.timed("TransactionsTab.apply_filters"):
+            self.model.set_filter(self.filters())
+
+    def reset_filters(self):
+        for line_edit in (self.search_input, self.amount_min, self.amount_max):
+            line_edit.clear()
+        self.period_check.setChecked(False)
+        self.type_filter.setCurrentIndex(0)
+        self.category_filter.setEditText("")
+
     def show_add_transaction_dialog(self):
         # Показывает диалог для добавления операции
         dialog = AddTransactionDialog(self)
@@ -290,37 +757,67 @@ class TransactionsTab(QWidget):
             try:
                 data = dialog.get_data()
                 amount = float(data["Сумма"])
-                Transaction.create(
-                    amount=amount,
-                    category=data["Категория"],
-                    date=data["Дата"],
-                    type=data["Тип"],
+                services.add_transaction(
+                    amount, data["Категория"], data["Дата"], data["Тип"], notes=data["Примечание"],
                 )
-                self.load_transactions()
             except ValueError:
                 QMessageBox.critical(self, "Ошибка", "Сумма должна быть числом!")
             except Exception as e:
                 QMessageBox.critical(self, "Ошибка", f"Не удалось добавить операцию: {e}")
 
+    def import_from_file(self):
+        # Импортирует операции из CSV, Excel или выписки OFX
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Импорт операций", "",
+            "Все поддерживаемые (*.csv *.xlsx *.ofx);;CSV (*.csv);;Excel Files (*.xlsx);;OFX (*.ofx)"
+        )
+        if path:
+            self.progress_bar.setValue(0)
+            task = self.runner.run(
+                "import", import_file, path,
+                on_result=lambda report: QMessageBox.information(self, "Импорт завершен", report.summary()),
+                on_error=lambda message: QMessageBox.critical(
+                    self, "Ошибка", f"Не удалось импортировать данные: {message}"),
+                on_progress=self.progress_bar.setValue,
+            )
+            # Запись снова доступна, когда задача завершилась (в том числе после отмены)
+            write_guard.set_locked(True)
+            task.signals.done.connect(lambda: write_guard.set_locked(False))
+
     def show_context_menu(self, position):
         # Показывает контекстное меню для таблицы операций
         menu = QMenu(self)
         delete_action = menu.addAction("Удалить операцию")
+        delete_action.setDisabled(write_guard.locked)
         delete_action.triggered.connect(self.delete_selected_transaction)
         menu.exec(self.table.viewport().mapToGlobal(position))
 
     def delete_selected_transaction(self):
-        # Удаляет выбранную операцию
-        selected_row = self.table.currentRow()
-        if selected_row >= 0:
-            transaction_id = Transaction.select()[selected_row].id
+        # Удаляет выбранные операции
+        transaction_ids = self.model.selected_ids(self.table)
+        if transaction_ids:
+            question = ("Вы уверены, что хотите удалить эту операцию?" if len(transaction_ids) == 1
+                        else f"Вы уверены, что хотите удалить выбранные операции ({len(transaction_ids)})?")
             reply = QMessageBox.question(
-                self, "Удаление операции", "Вы уверены, что хотите удалить эту операцию?",
+                self, "Удаление операции", question,
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             if reply == QMessageBox.StandardButton.Yes:
-                Transaction.delete_by_id(transaction_id)
-                self.load_transactions()
+                services.delete_transactions(transaction_ids)
+
+# Данные для графиков, импорт и экспорт (см. services.py) в рабочем потоке
+# (см. tasks.py): функции первым аргументом получают задачу
+def chart_data(task, chart_type, *filters):
+    return services.CHART_DATA[chart_type](*filters)
+
+def import_file(task, path):
+    return services.import_file(path, progress=task.report_progress, check_cancelled=task.check_cancelled)
+
+def export_file(task, path, date_from, date_to, operation_type):
+    return services.export_file(
+        path, date_from, date_to, operation_type,
+        progress=task.report_progress, check_cancelled=task.check_cancelled,
+    )
 
 # Вкладка для аналитики с анимацией fade in
 class AnalyticsTab(QWidget):
@@ -340,29 +837,81 @@ class AnalyticsTab(QWidget):
             "Линейная (динамика)"
         ])
         self.chart_type.currentTextChanged.connect(self.update_chart)
+
+        # Интервал и баланс нарастающим итогом для линейного графика
+        self.bucket_input = QComboBox()
+        for title, bucket in [("Авто", "auto"), ("День", "day"), ("Неделя", "week"),
+                              ("Месяц", "month"), ("Квартал", "quarter")]:
+            self.bucket_input.addItem(title, bucket)
+        self.bucket_input.currentIndexChanged.connect(self.update_chart)
+        self.balance_check = QCheckBox("Баланс")
+        self.balance_check.toggled.connect(self.update_chart)
         
         # Кнопки экспорта
-        self.export_btn = QPushButton("Экспорт в Excel")
-        self.export_btn.clicked.connect(self.export_to_excel)
+        self.export_btn = QPushButton("Экспорт данных")
+        self.export_btn.clicked.connect(self.export_data)
         
         self.export_chart_btn = QPushButton("Сохранить график")
         self.export_chart_btn.clicked.connect(self.export_chart)
 
+        # Фоновые задачи и индикатор их выполнения
+        self.runner = TaskRunner(self)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(150)
+        self.progress_bar.setVisible(False)
+        self.runner.busy_changed.connect(self.set_busy)
+
         # Виджет для графика
-        self.figure = plt.figure()
-        self.canvas = FigureCanvas(self.figure)
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.backends.backend_qtagg import NavigationToolbar2QT
+
+        from charts import CHARTS, LRUCache
+
+        # Отрисовка холста (Agg) замеряется отдельно от обновления графика
+        class Canvas(FigureCanvas):
+            def draw(self):
+                with profiling.timed("AnalyticsTab.canvas.draw"):
+                    super().draw()
+
+        self.figure = Figure()
+        self.canvas = Canvas(self.figure)
+        # Масштабирование и сдвиг линейного графика
+        self.toolbar = NavigationToolbar2QT(self.canvas, self)
+
+        # Построенные графики (свои оси у каждого типа) и кэш их данных,
+        # ключ — тип графика, фильтры, версия данных операций и версия базы
+        self.chart_classes = CHARTS
+        self.charts = {}
+        self.chart_cache = LRUCache()
+
+        # Видимое окно дат линейного графика (None — весь период). После
+        # масштабирования или сдвига данные окна запрашиваются с задержкой,
+        # когда пользователь перестанет двигать график
+        self.view_range = None
+        self.range_timer = QTimer(self)
+        self.range_timer.setSingleShot(True)
+        self.range_timer.setInterval(300)
+        self.range_timer.timeout.connect(self.refresh_if_visible)
+
+        # После изменения операций график обновляется с небольшой задержкой,
+        # чтобы серия изменений привела к одному пересчету
+        self.watcher = ChangeWatcher(self, (Transaction,), self.refresh_if_visible)
         
         # Размещение элементов управления
         controls_layout = QHBoxLayout()
         controls_layout.addWidget(self.chart_type)
+        controls_layout.addWidget(self.bucket_input)
+        controls_layout.addWidget(self.balance_check)
         controls_layout.addWidget(self.export_btn)
         controls_layout.addWidget(self.export_chart_btn)
+        controls_layout.addWidget(self.progress_bar)
         
         layout.addLayout(controls_layout)
+        layout.addWidget(self.toolbar)
         layout.addWidget(self.canvas)
         
         self.setLayout(layout)
-        self.update_chart()
 
     def showEvent(self, event):
         # Анимация появления вкладки
@@ -374,101 +923,700 @@ class AnalyticsTab(QWidget):
         self.fade_animation.setEndValue(1)
         self.fade_animation.start()
         super().showEvent(event)
+        # График строится (или берется готовым) после отрисовки вкладки
+        QTimer.singleShot(0, self.update_chart)
+
+    def refresh_if_visible(self):
+        if self.isVisible():
+            self.update_chart()
+
+    def chart_width(self):
+        # Ширина графика в пикселях с шагом 100 — бюджет точек линейного графика
+        return max(100, self.canvas.width() // 100 * 100)
+
+    def chart_filters(self, chart_type):
+        # Параметры, от которых зависят данные графика (кроме его типа). Для
+        # линейного графика: интервал, бюджет точек и окно дат. Окно расширяется
+        # на половину видимого диапазона в обе стороны и выравнивается по шагу
+        # в степень двойки дней: небольшой сдвиг не требует нового запроса,
+        # а уже загруженные окна берутся из кэша
+        if chart_type != LINE_CHART:
+            return ()
+        bucket = self.bucket_input.currentData()
+        budget = self.chart_width() // self.chart_classes[chart_type].PIXELS_PER_BUCKET
+        if self.view_range is None:
+            return (bucket, budget)
+        from timeseries import choose_bucket
+
+        first, last = self.view_range
+        if bucket == "auto":
+            bucket = choose_bucket(first, last, budget)
+        # Видимое окно целиком внутри уже загруженного — новый запрос не нужен
+        chart = self.charts.get(chart_type)
+        if chart is not None and chart.key is not None:
+            loaded = chart.key[1]
+            if (len(loaded) == 4 and loaded[:2] == (bucket, budget)
+                    and loaded[2] <= first and last <= loaded[3]):
+                return loaded
+        span = (last - first).days + 1
+        step = 1 << max(0, (span // 2).bit_length() - 1)
+        start = (first.toordinal() - span // 2) // step * step
+        end = -(-(last.toordinal() + span // 2) // step) * step
+        return (bucket, budget, date.fromordinal(max(1, start)), date.fromordinal(end))
+
+    def chart_options(self, chart_type):
+        # Параметры отображения (данные от них не зависят). Для линейного графика:
+        # баланс нарастающим итогом и бюджет точек по ширине графика
+        if chart_type != LINE_CHART:
+            return None
+        return (self.balance_check.isChecked(), self.chart_width())
+
+    def set_view_range(self, xmin, xmax):
+        # Пользователь масштабировал или сдвинул линейный график
+        from matplotlib.dates import num2date
+
+        self.view_range = (num2date(xmin).date(), num2date(xmax).date())
+        self.range_timer.start()
 
     def update_chart(self):
-        # Обновляет график
-        self.figure.clear()
+        # Показывает график выбранного типа. Если данные не менялись, график уже
+        # построен; если набор данных есть в кэше, он рисуется сразу; иначе данные
+        # готовятся в рабочем потоке, а прежний запрос отменяется
+        with profiling.timed("AnalyticsTab.update_chart"):
+            self._update_chart()
+
+    def _update_chart(self):
         chart_type = self.chart_type.currentText()
-        
-        if chart_type == "Круговая (категории)":
-            self.create_pie_chart()
-        elif chart_type == "Столбчатая (доходы/расходы)":
-            self.create_bar_chart()
-        elif chart_type == "Линейная (динамика)":
-            self.create_line_chart()
-            
-        self.canvas.draw()
-
-    def create_pie_chart(self):
-        # Создает круговую диаграмму по категориям расходов
+        is_line = chart_type == LINE_CHART
+        self.bucket_input.setEnabled(is_line)
+        self.balance_check.setEnabled(is_line)
+        self.toolbar.setVisible(is_line)
+        filters = self.chart_filters(chart_type)
+        # Версия данных этого процесса и версия базы (записи других процессов и
+        # соединений); при показе вкладки ключ пересчитывается и устаревший
+        # график перестраивается
+        key = (chart_type, filters, data_version(Transaction), database_version())
+        chart = self.charts.get(chart_type)
+        if chart is not None and chart.key == key and chart.options == self.chart_options(chart_type):
+            self.runner.cancel("chart")
+            self.show_chart(chart_type)
+            return
+        df = self.chart_cache.get(key)
+        if df is not None:
+            self.runner.cancel("chart")
+            self.draw_chart(chart_type, key, df)
+            return
+        self.runner.run(
+            "chart", chart_data, chart_type, *filters,
+            on_result=lambda df: self.store_and_draw_chart(chart_type, key, df),
+            on_error=self.show_chart_error,
+        )
+
+    def store_and_draw_chart(self, chart_type, key, df):
+        self.chart_cache.put(key, df)
+        self.draw_chart(chart_type, key, df)
+
+    def draw_chart(self, chart_type, key, df):
+        # Рисует (или обновляет на месте) график по уже агрегированным данным
+        chart = self.charts.get(chart_type)
+        if chart is None:
+            chart = self.chart_classes[chart_type](self.figure.add_subplot(111, label=chart_type))
+            if chart_type == LINE_CHART:
+                chart.range_changed = self.set_view_range
+            self.charts[chart_type] = chart
+        chart.options = self.chart_options(chart_type)
+        with profiling.timed(f"AnalyticsTab.draw_chart: {chart_type}"):
+            chart.draw(df)
+        chart.key = key
+        self.show_chart(chart_type)
+
+    def show_chart(self, chart_type):
+        # Оставляет видимыми только оси выбранного графика
+        for name, chart in self.charts.items():
+            chart.ax.set_visible(name == chart_type)
+        self.canvas.draw_idle()
+
+    def show_chart_error(self, message):
+        self.show_chart(None)
+        print(f"Ошибка: {message}")
+        QMessageBox.critical(self, "Ошибка", message)
+
+    def show_progress(self, percent):
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(percent)
+
+    def set_busy(self, busy):
+        # Индикатор фоновой работы: без процентов, пока задача их не сообщит
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(busy)
+
+    def export_data(self):
+        # Экспортирует операции в Excel, CSV или Parquet в рабочем потоке
+        dialog = ExportDialog(self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        path, selected_filter = QFileDialog.getSaveFileName(
+            self, "Сохранить как", "", ";;".join(EXPORT_FILTERS)
+        )
+        if path:
+            if not os.path.splitext(path)[1]:
+                path += EXPORT_FILTERS[selected_filter]
+            date_from, date_to, operation_type = dialog.get_filters()
+            self.runner.run(
+                "export", export_file, path, date_from, date_to, operation_type,
+                on_result=lambda count: QMessageBox.information(
+                    self, "Успех", f"Экспортировано операций: {count}"),
+                on_error=lambda message: QMessageBox.critical(
+                    self, "Ошибка", f"Не удалось экспортировать данные: {message}"),
+                on_progress=self.show_progress,
+            )
+
+    def export_chart(self):
+        # Сохраняет текущий график в файл
         try:
-            query = Transaction.select().where(Transaction.type == "Расход")
-            df = pd.DataFrame([{"Категории": t.category, "amount": t.amount} for t in query])
-            if df.empty:
-                raise ValueError("Нет данных для построения графика")
-            df = df.groupby("Категории").sum()
-            ax = self.figure.add_subplot(111)
-            ax.pie(df["amount"], labels=df.index, autopct="%1.1f%%")
-            ax.set_title("Расходы по категориям")
+            path, _ = QFileDialog.getSaveFileName(self, "Сохранить график", "", "PNG Files (*.png);;PDF Files (*.pdf)")
+            if path:
+                self.figure.savefig(path)
+                QMessageBox.information(self, "Успех", "График сохранен!")
         except Exception as e:
-            print(f"Ошибка: {e}")
-            QMessageBox.critical(self, "Ошибка", str(e))
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить график: {e}")
+
+class RecurringRuleTableModel(LazyTableModel):
+    model_class = RecurringRule
+    fields = (RecurringRule.title, RecurringRule.amount, RecurringRule.category, RecurringRule.type,
+              RecurringRule.frequency, RecurringRule.interval, RecurringRule.next_date)
+    headers = ("Название", "Сумма", "Категория", "Тип", "Частота", "Интервал", "Следующая")
+
+    def format_value(self, column, value):
+        if column == 4:
+            return FREQUENCIES.get(value, value)
+        if column == 6 and value is None:
+            return "завершено"
+        return str(value)
+
+
+# Диалог для добавления регулярной операции с анимацией появления (fade in)
+class AddRecurringRuleDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Добавить регулярную операцию")
+
+        # Поля для ввода данных
+        self.title_input = QLineEdit()
+        self.amount_input = QLineEdit()
+        self.category_input = QComboBox()
+        self.category_input.setEditable(True)
+        self.category_input.addItems([""] + transaction_categories())
+        self.type_input = QComboBox()
+        self.type_input.addItems(["Расход", "Доход"])
+        self.notes_input = QLineEdit()
+        self.frequency_input = QComboBox()
+        for frequency, title in FREQUENCIES.items():
+            self.frequency_input.addItem(title, frequency)
+        self.frequency_input.setCurrentIndex(list(FREQUENCIES).index("month"))
+        self.interval_input = QSpinBox()
+        self.interval_input.setRange(1, 365)
+        self.start_date_input = QDateEdit(QDate.currentDate())
+        self.start_date_input.setCalendarPopup(True)
+        self.start_date_input.setDisplayFormat("dd.MM.yyyy")
+        # Окончание: дата или число повторений (0 — без ограничения)
+        self.end_check = QCheckBox("до")
+        self.end_date_input = QDateEdit(QDate.currentDate().addYears(1))
+        self.end_date_input.setCalendarPopup(True)
+        self.end_date_input.setDisplayFormat("dd.MM.yyyy")
+        self.end_date_input.setEnabled(False)
+        self.end_check.toggled.connect(self.end_date_input.setEnabled)
+        self.count_input = QSpinBox()
+        self.count_input.setRange(0, 10000)
+        self.count_input.setSpecialValueText("без ограничения")
+
+        # Кнопки "ОК" и "Отмена"
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        end_layout = QHBoxLayout()
+        end_layout.addWidget(self.end_check)
+        end_layout.addWidget(self.end_date_input)
+
+        # Форма для размещения полей
+        form_layout = QFormLayout()
+        form_layout.addRow("Название:", self.title_input)
+        form_layout.addRow("Сумма:", self.amount_input)
+        form_layout.addRow("Категория:", self.category_input)
+        form_layout.addRow("Тип:", self.type_input)
+        form_layout.addRow("Примечание:", self.notes_input)
+        form_layout.addRow("Повторять:", self.frequency_input)
+        form_layout.addRow("Каждые (дней, недель, месяцев, лет):", self.interval_input)
+        form_layout.addRow("Первая операция:", self.start_date_input)
+        form_layout.addRow("Повторять до даты:", end_layout)
+        form_layout.addRow("Число повторений:", self.count_input)
+        form_layout.addRow(buttons)
+
+        self.setLayout(form_layout)
+
+        # Подготовка анимации появления диалога
+        self.setWindowOpacity(0)
+        self.fade_animation = QPropertyAnimation(self, b"windowOpacity")
+        self.fade_animation.setDuration(500)
+        self.fade_animation.setStartValue(0)
+        self.fade_animation.setEndValue(1)
 
-    def create_bar_chart(self):
-        # Создает столбчатую диаграмму доходов/расходов по категориям
+    def showEvent(self, event):
+        self.fade_animation.start()
+        super().showEvent(event)
+
+    def get_data(self):
+        # Возвращает введенные данные
+        return {
+            "title": self.title_input.text().strip(),
+            "amount": self.amount_input.text(),
+            "category": self.category_input.currentText().strip(),
+            "type": self.type_input.currentText(),
+            "notes": self.notes_input.text(),
+            "frequency": self.frequency_input.currentData(),
+            "interval": self.interval_input.value(),
+            "start_date": self.start_date_input.date().toPyDate(),
+            "end_date": self.end_date_input.date().toPyDate() if self.end_check.isChecked() else None,
+            "count": self.count_input.value() or None,
+        }
+
+
+# Вкладка регулярных операций: правила и ближайшие повторения. Наступившие
+# повторения проводятся при запуске приложения (см. main.py) и по кнопке
+class RecurringTab(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.fade_animation = None
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+
+        # Таблица правил
+        self.model = RecurringRuleTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QTableView.SelectionMode.ExtendedSelection)
+        self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_context_menu)
+        layout.addWidget(self.table)
+
+        # Кнопки добавления правила и проведения наступивших повторений
+        buttons_layout = QHBoxLayout()
+        self.add_button = QPushButton("Добавить регулярную операцию")
+        self.add_button.clicked.connect(self.show_add_rule_dialog)
+        self.post_button = QPushButton("Провести наступившие")
+        self.post_button.clicked.connect(self.post_due)
+        write_guard.bind(self.add_button, self.post_button)
+        buttons_layout.addWidget(self.add_button)
+        buttons_layout.addWidget(self.post_button)
+        layout.addLayout(buttons_layout)
+
+        # Ближайшие повторения: разворачиваются только в окне UPCOMING_DAYS дней
+        layout.addWidget(QLabel(f"Ближайшие операции ({services.UPCOMING_DAYS} дней):"))
+        self.upcoming_table = QTableWidget(0, 5)
+        self.upcoming_table.setHorizontalHeaderLabels(["Дата", "Название", "Сумма", "Категория", "Тип"])
+        self.upcoming_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.upcoming_table)
+
+        # Ближайшие повторения меняются вместе с правилами
+        self.watcher = ChangeWatcher(self, (RecurringRule,), self.load_upcoming)
+
+        self.setLayout(layout)
+        self.load_upcoming()
+
+    def showEvent(self, event):
+        # Анимация появления вкладки
+        effect = QGraphicsOpacityEffect(self)
+        self.setGraphicsEffect(effect)
+        self.fade_animation = QPropertyAnimation(effect, b"opacity")
+        self.fade_animation.setDuration(1000)
+        self.fade_animation.setStartValue(0)
+        self.fade_animation.setEndValue(1)
+        self.fade_animation.start()
+        super().showEvent(event)
+
+    def load_upcoming(self):
+        # Заполняет таблицу ближайших повторений
         try:
-            query = Transaction.select()
-            df = pd.DataFrame([{
-                "Категории": t.category,
-                "amount": t.amount,
-                "Тип": t.type
-            } for t in query])
-            if df.empty:
-                raise ValueError("Нет данных для построения графика")
-            df = df.groupby(["Категории", "Тип"]).sum().unstack(fill_value=0)
-            ax = self.figure.add_subplot(111)
-            df["amount"].plot(kind="bar", ax=ax, stacked=True)
-            ax.set_title("Доходы/расходы по категориям")
+            with profiling.timed("RecurringTab.load_upcoming"):
+                upcoming = services.upcoming_occurrences(date.today() + timedelta(days=1))
         except Exception as e:
-            print(f"Ошибка: {e}")
-            QMessageBox.critical(self, "Ошибка", str(e))
+            print(f"Ошибка при загрузке регулярных операций: {e}")
+            return
+        self.upcoming_table.setRowCount(len(upcoming))
+        for row, (day, title, amount, category, operation_type) in enumerate(upcoming):
+            values = [day.strftime("%d.%m.%Y"), title, f"{amount:.2f}", category, operation_type]
+            for column, value in enumerate(values):
+                self.upcoming_table.setItem(row, column, QTableWidgetItem(value))
 
-    def create_line_chart(self):
-        # Создает линейный график доходов/расходов по датам
+    def show_add_rule_dialog(self):
+        # Окно добавления правила; повторения на сегодня и раньше проводятся сразу
+        dialog = AddRecurringRuleDialog(self)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        data = dialog.get_data()
         try:
-            query = Transaction.select()
-            df = pd.DataFrame([{
-                "Дата": datetime.strptime(t.date, "%Y-%m-%d"),
-                "amount": t.amount,
-                "Тип": t.type
-            } for t in query])
-            if df.empty:
-                raise ValueError("Нет данных для построения графика")
-            df = df.groupby(["Дата", "Тип"]).sum().unstack(fill_value=0)
-            ax = self.figure.add_subplot(111)
-            if "Доход" in df["amount"].columns:
-                df["amount"]["Доход"].plot(ax=ax, label="Доход")
-            if "Расход" in df["amount"].columns:
-                df["amount"]["Расход"].plot(ax=ax, label="Расход")
-            ax.set_title("Динамика доходов и расходов")
-            ax.legend()
+            amount = float(data["amount"])
+        except ValueError:
+            QMessageBox.critical(self, "Ошибка", "Сумма должна быть числом!")
+            return
+        if not data["category"]:
+            QMessageBox.critical(self, "Ошибка", "Укажите категорию!")
+            return
+        try:
+            services.add_recurring_rule(
+                data["title"] or data["category"], amount, data["category"], data["type"],
+                data["frequency"], data["start_date"], interval=data["interval"],
+                end_date=data["end_date"], count=data["count"], notes=data["notes"],
+            )
         except Exception as e:
-            print(f"Ошибка: {e}")
-            QMessageBox.critical(self, "Ошибка", str(e))
+            QMessageBox.critical(self, "Ошибка", f"Не удалось добавить регулярную операцию: {e}")
+            return
+        self.post_due()
 
-    def export_to_excel(self):
-        # Экспортирует все транзакции в Excel
+    def post_due(self):
         try:
-            query = Transaction.select()
-            df = pd.DataFrame([{
-                "Дата": t.date,
-                "Категория": t.category,
-                "Сумма": t.amount,
-                "Тип": t.type
-            } for t in query])
-            path, _ = QFileDialog.getSaveFileName(self, "Сохранить как", "", "Excel Files (*.xlsx)")
-            if path:
-                df.to_excel(path, index=False)
-                QMessageBox.information(self, "Успех", "Данные экспортированы в Excel!")
+            posted = services.post_recurring()
         except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось экспортировать данные: {e}")
+            QMessageBox.critical(self, "Ошибка", f"Не удалось провести операции: {e}")
+            return
+        if posted:
+            QMessageBox.information(self, "Регулярные операции", f"Проведено операций: {posted}")
 
-    def export_chart(self):
-        # Сохраняет текущий график в файл
+    def show_context_menu(self, position):
+        # Показывает контекстное меню для таблицы правил
+        menu = QMenu(self)
+        delete_action = menu.addAction("Удалить регулярную операцию")
+        delete_action.setDisabled(write_guard.locked)
+        delete_action.triggered.connect(self.delete_selected_rule)
+        menu.exec(self.table.viewport().mapToGlobal(position))
+
+    def delete_selected_rule(self):
+        # Удаляет выбранные правила; проведенные операции остаются
+        rule_ids = self.model.selected_ids(self.table)
+        if rule_ids:
+            question = ("Удалить эту регулярную операцию? Проведенные операции останутся." if len(rule_ids) == 1
+                        else f"Удалить выбранные регулярные операции ({len(rule_ids)})? "
+                             "Проведенные операции останутся.")
+            reply = QMessageBox.question(
+                self, "Удаление регулярной операции", question,
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                services.delete_recurring_rules(rule_ids)
+
+
+# Диалог месячного бюджета категории
+class BudgetDialog(QDialog):
+    def __init__(self, parent=None, budget=None):
+        super().__init__(parent)
+        self.setWindowTitle("Бюджет категории")
+
+        # Поля для ввода данных
+        self.category_input = QComboBox()
+        self.category_input.setEditable(True)
+        self.category_input.addItems([""] + transaction_categories())
+        self.amount_input = QLineEdit()
+        self.start_month_input = QDateEdit(QDate.currentDate())
+        self.start_month_input.setDisplayFormat("MM.yyyy")
+        if budget is not None:
+            self.category_input.setEditText(budget.category)
+            self.amount_input.setText(f"{budget.amount:g}")
+            self.start_month_input.setDate(QDate.fromString(budget.start_month, "yyyy-MM"))
+
+        # Кнопки "ОК" и "Отмена"
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        # Форма для размещения полей
+        form_layout = QFormLayout()
+        form_layout.addRow("Категория расходов:", self.category_input)
+        form_layout.addRow("Лимит в месяц:", self.amount_input)
+        form_layout.addRow("Действует с месяца:", self.start_month_input)
+        form_layout.addRow(buttons)
+        self.setLayout(form_layout)
+
+    def get_data(self):
+        # Возвращает введенные данные
+        return {
+            "category": self.category_input.currentText().strip(),
+            "amount": self.amount_input.text(),
+            "start_month": self.start_month_input.date().toString("yyyy-MM"),
+        }
+
+
+# Вкладка бюджетов: лимиты расходов по категориям против фактических расходов
+# за выбранные месяцы. Расходы берутся из месячных итогов (см. budgets_with_spending),
+# поэтому таблица строится мгновенно при любом периоде
+class BudgetsTab(QWidget):
+    HEADERS = ["Категория", "Лимит в месяц", "Месяцев", "Бюджет", "Потрачено", "Остаток", "Выполнено"]
+
+    def __init__(self):
+        super().__init__()
+        self.fade_animation = None
+        self.budget_ids = []  # id бюджетов в порядке строк таблицы
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+
+        # Период: месяцы с ... по ...
+        self.month_from = QDateEdit(QDate.currentDate())
+        self.month_to = QDateEdit(QDate.currentDate())
+        for month_input in (self.month_from, self.month_to):
+            month_input.setDisplayFormat("MM.yyyy")
+            month_input.dateChanged.connect(self.load_budgets)
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel("Месяцы с"))
+        period_layout.addWidget(self.month_from)
+        period_layout.addWidget(QLabel("по"))
+        period_layout.addWidget(self.month_to)
+        period_layout.addStretch()
+        layout.addLayout(period_layout)
+
+        # Таблица бюджетов
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.table.customContextMenuRequested.connect(self.show_context_menu)
+        self.table.doubleClicked.connect(lambda index: self.show_budget_dialog(index.row()))
+        layout.addWidget(self.table)
+
+        self.add_button = QPushButton("Задать бюджет")
+        self.add_button.clicked.connect(lambda: self.show_budget_dialog())
+        write_guard.bind(self.add_button)
+        layout.addWidget(self.add_button)
+
+        # Расходы меняются вместе с операциями: после серии изменений таблица
+        # перечитывается одним запросом
+        self.watcher = ChangeWatcher(self, (Transaction, Budget), self.load_budgets)
+
+        self.setLayout(layout)
+        self.load_budgets()
+
+    def showEvent(self, event):
+        # Анимация появления вкладки
+        effect = QGraphicsOpacityEffect(self)
+        self.setGraphicsEffect(effect)
+        self.fade_animation = QPropertyAnimation(effect, b"opacity")
+        self.fade_animation.setDuration(1000)
+        self.fade_animation.setStartValue(0)
+        self.fade_animation.setEndValue(1)
+        self.fade_animation.start()
+        super().showEvent(event)
+
+    def load_budgets(self):
+        # Заполняет таблицу бюджетов за выбранные месяцы; превышенные — красным
+        month_from = self.month_from.date().toString("yyyy-MM")
+        month_to = self.month_to.date().toString("yyyy-MM")
         try:
-            path, _ = QFileDialog.getSaveFileName(self, "Сохранить график", "", "PNG Files (*.png);;PDF Files (*.pdf)")
-            if path:
-                self.figure.savefig(path)
-                QMessageBox.information(self, "Успех", "График сохранен!")
+            with profiling.timed("BudgetsTab.load_budgets"):
+                report = services.budget_report(min(month_from, month_to), max(month_from, month_to))
         except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить график: {e}")
+            print(f"Ошибка при загрузке бюджетов: {e}")
+            return
+        self.budget_ids = [budget["id"] for budget in report]
+        self.table.setRowCount(len(report))
+        for row, budget in enumerate(report):
+            values = [budget["category"], f"{budget['monthly']:.2f}", budget["months"], f"{budget['budget']:.2f}",
+                      f"{budget['spent']:.2f}", f"{budget['remaining']:.2f}",
+                      "—" if budget["percent"] is None else f"{budget['percent']:g}%"]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if budget["remaining"] < 0:
+                    item.setForeground(QColor("red"))
+                self.table.setItem(row, column, item)
+
+    def show_budget_dialog(self, row=None):
+        # Новый бюджет или изменение бюджета в строке row
+        if write_guard.locked:
+            return
+        budget = None
+        if row is not None and 0 <= row < len(self.budget_ids):
+            budget = Budget.get_or_none(Budget.id == self.budget_ids[row])
+        dialog = BudgetDialog(self, budget)
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            return
+        data = dialog.get_data()
+        try:
+            amount = float(data["amount"])
+        except ValueError:
+            QMessageBox.critical(self, "Ошибка", "Сумма должна быть числом!")
+            return
+        if not data["category"]:
+            QMessageBox.critical(self, "Ошибка", "Укажите категорию!")
+            return
+        try:
+            services.set_budget(data["category"], amount, data["start_month"],
+                                budget_id=budget.id if budget is not None else None)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось задать бюджет: {e}")
+
+    def show_context_menu(self, position):
+        menu = QMenu(self)
+        edit_action = menu.addAction("Изменить бюджет")
+        edit_action.triggered.connect(lambda: self.show_budget_dialog(self.table.currentRow()))
+        delete_action = menu.addAction("Удалить бюджет")
+        delete_action.triggered.connect(self.delete_selected_budget)
+        for action in (edit_action, delete_action):
+            action.setDisabled(write_guard.locked)
+        menu.exec(self.table.viewport().mapToGlobal(position))
+
+    def delete_selected_budget(self):
+        # Удаляет выбранные бюджеты
+        budget_ids = [self.budget_ids[index.row()] for index in self.table.selectionModel().selectedRows()]
+        if budget_ids:
+            question = ("Вы уверены, что хотите удалить этот бюджет?" if len(budget_ids) == 1
+                        else f"Вы уверены, что хотите удалить выбранные бюджеты ({len(budget_ids)})?")
+            reply = QMessageBox.question(
+                self, "Удаление бюджета", question,
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+            )
+            if reply == QMessageBox.StandardButton.Yes:
+                services.delete_budgets(budget_ids)
+
+# Скрытая вкладка отладки (Ctrl+Shift+D): замеры путей интерфейса и запросов
+# к базе со скользящими гистограммами задержек (см. profiling.py), последние
+# запросы и профилирование cProfile
+class DebugTab(QWidget):
+    SPARKS = "▁▂▃▄▅▆▇█"
+    STAT_HEADERS = ["Вызовов", "Всего, мс", "Среднее", "p50", "p90", "p99", "Макс", "Распределение"]
+
+    def __init__(self):
+        super().__init__()
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout()
+
+        self.record_check = QCheckBox("Записывать замеры")
+        self.record_check.setChecked(profiling.enabled)
+        self.record_check.toggled.connect(self.set_recording)
+        self.profile_check = QCheckBox("Профилирование (cProfile)")
+        self.profile_check.setChecked(profiling.profiling_active())
+        self.profile_check.toggled.connect(self.toggle_profile)
+        self.reset_button = QPushButton("Сбросить")
+        self.reset_button.clicked.connect(self.reset)
+        self.dump_button = QPushButton("Сохранить JSON")
+        self.dump_button.clicked.connect(self.dump)
+        controls_layout = QHBoxLayout()
+        controls_layout.addWidget(self.record_check)
+        controls_layout.addWidget(self.profile_check)
+        controls_layout.addStretch()
+        controls_layout.addWidget(self.reset_button)
+        controls_layout.addWidget(self.dump_button)
+        layout.addLayout(controls_layout)
+
+        edges = profiling.HISTOGRAM_EDGES_MS
+        histogram_tip = "Корзины, мс: " + ", ".join(
+            [f"<{edges[0]}"] + [f"{low}–{high}" for low, high in zip(edges, edges[1:])] + [f"≥{edges[-1]}"])
+        self.paths_table = self.create_table(["Путь"] + self.STAT_HEADERS, histogram_tip)
+        self.queries_table = self.create_table(["Запрос", "Строк"] + self.STAT_HEADERS, histogram_tip)
+        self.recent_table = self.create_table(["Время", "мс", "Строк", "Поток", "Запрос", "Параметры"])
+        self.profile_text = QPlainTextEdit()
+        self.profile_text.setReadOnly(True)
+        self.profile_text.setPlaceholderText("Включите профилирование, выполните действия и выключите его")
+
+        self.sections = QTabWidget()
+        self.sections.addTab(self.paths_table, "Пути интерфейса")
+        self.sections.addTab(self.queries_table, "Запросы")
+        self.sections.addTab(self.recent_table, "Последние запросы")
+        self.sections.addTab(self.profile_text, "Профиль")
+        layout.addWidget(self.sections)
+        self.setLayout(layout)
+
+        # Пока вкладка видна, таблицы обновляются раз в секунду
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def create_table(self, headers, histogram_tip=None):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        table.setWordWrap(False)
+        if histogram_tip:
+            table.horizontalHeaderItem(len(headers) - 1).setToolTip(histogram_tip)
+        return table
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def sparkline(self, buckets):
+        top = max(buckets) or 1
+        return "".join(self.SPARKS[0] if not count else self.SPARKS[max(1, round(count / top * 7))]
+                       for count in buckets)
+
+    def stat_values(self, summary):
+        return [summary["count"], f"{summary['total_ms']:.1f}", f"{summary['mean_ms']:.2f}",
+                f"{summary['p50_ms']:.2f}", f"{summary['p90_ms']:.2f}", f"{summary['p99_ms']:.2f}",
+                f"{summary['max_ms']:.2f}", self.sparkline(summary["histogram"])]
+
+    def fill_table(self, table, rows, tooltips=None):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if column == 0 and tooltips:
+                    item.setToolTip(tooltips[row])
+                table.setItem(row, column, item)
+
+    def refresh(self):
+        # Самые затратные пути и запросы — сверху
+        snapshot = profiling.snapshot()
+        by_total = lambda item: -item[1]["total_ms"]
+        paths = sorted(snapshot["paths"].items(), key=by_total)
+        self.fill_table(self.paths_table, [[name] + self.stat_values(summary) for name, summary in paths])
+        queries = sorted(snapshot["queries"].items(), key=by_total)
+        self.fill_table(
+            self.queries_table,
+            [[profiling.short_sql(sql), summary["rows"]] + self.stat_values(summary) for sql, summary in queries],
+            tooltips=[sql for sql, _ in queries],
+        )
+        recent = snapshot["recent_queries"][::-1]
+        self.fill_table(
+            self.recent_table,
+            [[query["at"][11:], f"{query['ms']:.2f}", query["rows"], query["thread"],
+              profiling.short_sql(query["sql"]), ", ".join(query["params"])] for query in recent],
+            tooltips=[query["sql"] for query in recent],
+        )
+
+    def set_recording(self, checked):
+        profiling.enabled = checked
+
+    def reset(self):
+        profiling.reset()
+        self.refresh()
+
+    def dump(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Сохранить замеры", "profile.json", "JSON (*.json)")
+        if path:
+            try:
+                profiling.dump(path)
+            except OSError as e:
+                QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить замеры: {e}")
+
+    def toggle_profile(self, checked):
+        if checked:
+            self.profile_text.clear()
+            profiling.start_profile()
+            return
+        # Профиль можно сохранить для snakeviz или pstats; без файла — только текст
+        path, _ = QFileDialog.getSaveFileName(self, "Сохранить профиль", "profile.prof", "Профиль (*.prof)")
+        try:
+            self.profile_text.setPlainText(profiling.stop_profile(path or None))
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить профиль: {e}")
+        self.sections.setCurrentWidget(self.profile_text)